@@ -6,60 +6,82 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-class Settings:
-    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./library.db")
-    GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
+# CORS allowed origins (comma-separated list), split once at import
+CORS_ORIGINS: tuple[str, ...] = tuple(
+    origin.strip()
+    for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+    if origin.strip()
+)
+
+# Predefined categories for books
+CATEGORIES: tuple[str, ...] = (
+    "fiction",
+    "non-fiction",
+    "sci-fi",
+    "fantasy",
+    "mystery",
+    "thriller",
+    "romance",
+    "horror",
+    "biography",
+    "history",
+    "science",
+    "self-help",
+    "business",
+    "philosophy",
+    "classic",
+    "young-adult",
+    "children",
+)
 
-    # CORS allowed origins (comma-separated list)
-    CORS_ORIGINS: list[str] = [
-        origin.strip()
-        for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
-        if origin.strip()
-    ]
+# Predefined moods for books
+MOODS: tuple[str, ...] = (
+    "inspiring",
+    "relaxing",
+    "thrilling",
+    "thought-provoking",
+    "funny",
+    "heartwarming",
+    "dark",
+    "adventurous",
+    "romantic",
+    "educational",
+    "cozy",
+    "suspenseful",
+    "uplifting",
+)
 
-    # Predefined categories for books
-    CATEGORIES: list[str] = [
-        "fiction",
-        "non-fiction",
-        "sci-fi",
-        "fantasy",
-        "mystery",
-        "thriller",
-        "romance",
-        "horror",
-        "biography",
-        "history",
-        "science",
-        "self-help",
-        "business",
-        "philosophy",
-        "classic",
-        "young-adult",
-        "children",
-    ]
+# Book formats
+FORMATS: tuple[str, ...] = ("kindle", "physical", "audiobook", "pdf", "epub")
 
-    # Predefined moods for books
-    MOODS: list[str] = [
-        "inspiring",
-        "relaxing",
-        "thrilling",
-        "thought-provoking",
-        "funny",
-        "heartwarming",
-        "dark",
-        "adventurous",
-        "romantic",
-        "educational",
-        "cozy",
-        "suspenseful",
-        "uplifting",
-    ]
+# Reading statuses
+READING_STATUSES: tuple[str, ...] = ("unread", "reading", "completed", "dnf")
 
-    # Book formats
-    FORMATS: list[str] = ["kindle", "physical", "audiobook", "pdf", "epub"]
 
-    # Reading statuses
-    READING_STATUSES: list[str] = ["unread", "reading", "completed", "dnf"]
+class Settings:
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./library.db")
+    # Turns off the embedding model, vector search and embedding backfills
+    DISABLE_EMBEDDINGS: bool = os.getenv("DISABLE_EMBEDDINGS", "false").lower() == "true"
+    GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
+    # "onnx" (int8-quantized ONNX Runtime) or "torch" (full-precision PyTorch)
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "onnx")
+    # Texts per embedding forward pass when encoding in bulk; 0 picks one
+    # for the device the model runs on
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "0"))
+    # Cosine similarity at which a search reuses the results of an earlier,
+    # differently worded query (above 1 turns the semantic cache off)
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    # HNSW candidate list size per vector search (higher = better recall, slower)
+    HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", "40"))
+    # Shortlist vector search candidates on a 1-bit index before ranking by
+    # the full embedding (pgvector 0.7+); pays off for very large libraries
+    BINARY_QUANTIZED_SEARCH: bool = os.getenv("BINARY_QUANTIZED_SEARCH", "false").lower() == "true"
+
+    CORS_ORIGINS = CORS_ORIGINS
+    CATEGORIES = CATEGORIES
+    MOODS = MOODS
+    FORMATS = FORMATS
+    READING_STATUSES = READING_STATUSES
 
 
 @lru_cache
@@ -1,5 +1,8 @@
 import logging
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel, create_engine, Session, text
+from sqlmodel.ext.asyncio.session import AsyncSession
 from .config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -26,6 +29,62 @@ engine = create_engine(
 )
 
 
+def get_async_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its asyncio counterpart."""
+    scheme, _, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if dialect == "postgresql":
+        # No prepared statement caching (SQLAlchemy's nor asyncpg's): behind
+        # a transaction-mode pooler (pgbouncer, Supabase port 6543) the next
+        # transaction can land on a server connection that doesn't have them
+        separator = "&" if "?" in rest else "?"
+        return f"postgresql+asyncpg://{rest}{separator}prepared_statement_cache_size=0"
+    return url
+
+
+# Async engine for request handlers (aiosqlite / asyncpg). The sync engine
+# above stays in use for startup migrations and the embedding workers,
+# which run in threads.
+async_connect_args = {}
+if db_url.startswith("postgresql"):
+    async_connect_args["ssl"] = "disable"
+    async_connect_args["statement_cache_size"] = 0
+
+async_engine = create_async_engine(
+    get_async_url(db_url),
+    connect_args=async_connect_args,
+    echo=False,
+    pool_pre_ping=True,
+    pool_recycle=300,
+    pool_size=5,
+    max_overflow=10,
+)
+
+# Objects stay loaded after commit; lazy refreshes can't run on an AsyncSession
+async_session_maker = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+def _set_sqlite_pragma(dbapi_connection, _):
+    """Tune SQLite for concurrent reads and cheaper writes on each new connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    # Enforce foreign keys so ON DELETE CASCADE removes a book's tags
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+if db_url.startswith("sqlite"):
+    event.listen(engine, "connect", _set_sqlite_pragma)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragma)
+
+
 def create_db_and_tables():
     # Enable pgvector extension if using PostgreSQL
     if db_url.startswith("postgresql"):
@@ -37,22 +96,154 @@ def create_db_and_tables():
             except Exception as e:
                 logger.warning(f"Could not enable pgvector extension: {e}")
 
+        with Session(engine) as session:
+            try:
+                session.exec(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                session.commit()
+                logger.info("pg_trgm extension enabled")
+            except Exception as e:
+                logger.warning(f"Could not enable pg_trgm extension: {e}")
+
     SQLModel.metadata.create_all(engine)
 
-    # Add embedding column if it doesn't exist (SQLModel doesn't handle pgvector columns)
+    # create_all only adds indexes together with new tables; add any that are
+    # missing from tables created before the index was declared
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    # Columns added after the books table was first created
+    book_columns = {column["name"] for column in inspect(engine).get_columns("books")}
+    if "embedding_text_hash" not in book_columns:
+        with Session(engine) as session:
+            session.exec(text("ALTER TABLE books ADD COLUMN embedding_text_hash VARCHAR(32)"))
+            session.commit()
+            logger.info("Added embedding_text_hash column")
+
     if db_url.startswith("postgresql"):
+        # Timestamp defaults for books tables created when the app stamped
+        # them in Python
         with Session(engine) as session:
             try:
                 session.exec(text("""
                     ALTER TABLE books
-                    ADD COLUMN IF NOT EXISTS embedding vector(384)
+                    ALTER COLUMN created_at SET DEFAULT now(),
+                    ALTER COLUMN updated_at SET DEFAULT now()
+                """))
+                session.commit()
+                logger.info("Timestamp defaults ensured")
+            except Exception as e:
+                logger.warning(f"Could not set timestamp defaults: {e}")
+
+        # Add embedding column if it doesn't exist (SQLModel doesn't handle pgvector columns)
+        with Session(engine) as session:
+            try:
+                session.exec(text("""
+                    ALTER TABLE books
+                    ADD COLUMN IF NOT EXISTS embedding halfvec(384)
                 """))
                 session.commit()
                 logger.info("Embedding column ensured")
             except Exception as e:
                 logger.warning(f"Could not add embedding column: {e}")
 
+        # Convert full-precision embeddings from older deployments to halfvec;
+        # the old HNSW index uses vector_cosine_ops, so it has to go first
+        with Session(engine) as session:
+            try:
+                column_type = session.exec(text("""
+                    SELECT format_type(atttypid, atttypmod)
+                    FROM pg_attribute
+                    WHERE attrelid = 'books'::regclass
+                      AND attname = 'embedding'
+                      AND NOT attisdropped
+                """)).scalar()
+                if column_type and column_type.startswith("vector"):
+                    session.exec(text("DROP INDEX IF EXISTS ix_books_embedding_hnsw"))
+                    session.exec(text("""
+                        ALTER TABLE books
+                        ALTER COLUMN embedding TYPE halfvec(384)
+                        USING embedding::halfvec(384)
+                    """))
+                    session.commit()
+                    logger.info("Converted embedding column to halfvec")
+            except Exception as e:
+                logger.warning(f"Could not convert embedding column to halfvec: {e}")
+
+        # HNSW index so similarity search doesn't scan every embedding.
+        # Embeddings are unit length, so search ranks by inner product; the
+        # cosine index from older deployments is replaced.
+        with Session(engine) as session:
+            try:
+                session.exec(text("DROP INDEX IF EXISTS ix_books_embedding_hnsw"))
+                session.exec(text("""
+                    CREATE INDEX IF NOT EXISTS ix_books_embedding_ip_hnsw
+                    ON books USING hnsw (embedding halfvec_ip_ops)
+                    WITH (m = 16, ef_construction = 64)
+                """))
+                session.commit()
+                logger.info("Embedding HNSW index ensured")
+            except Exception as e:
+                logger.warning(f"Could not create embedding HNSW index: {e}")
+
+        # Index on the embeddings' sign bits for BINARY_QUANTIZED_SEARCH; the
+        # expression must match the one VectorStore.search orders by
+        if settings.BINARY_QUANTIZED_SEARCH:
+            with Session(engine) as session:
+                try:
+                    session.exec(text("""
+                        CREATE INDEX IF NOT EXISTS ix_books_embedding_bit_hnsw
+                        ON books USING hnsw ((binary_quantize(embedding)::bit(384)) bit_hamming_ops)
+                        WITH (m = 16, ef_construction = 64)
+                    """))
+                    session.commit()
+                    logger.info("Binary embedding HNSW index ensured")
+                except Exception as e:
+                    logger.warning(f"Could not create binary embedding HNSW index: {e}")
+
+        # Generated tsvector column + GIN index for the library search filter.
+        # The 'simple' config keeps every word unstemmed, so author names and
+        # title words like "The" match as typed. It replaces the earlier
+        # 'english' search_tsv column (its index is dropped with it).
+        with Session(engine) as session:
+            try:
+                session.exec(text("ALTER TABLE books DROP COLUMN IF EXISTS search_tsv"))
+                session.exec(text("""
+                    ALTER TABLE books
+                    ADD COLUMN IF NOT EXISTS search_vec tsvector
+                    GENERATED ALWAYS AS (
+                        to_tsvector(
+                            'simple',
+                            coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || coalesce(description, '')
+                        )
+                    ) STORED
+                """))
+                session.exec(text("""
+                    CREATE INDEX IF NOT EXISTS ix_books_search_vec
+                    ON books USING gin (search_vec)
+                """))
+                session.commit()
+                logger.info("Full-text search column ensured")
+            except Exception as e:
+                logger.warning(f"Could not add full-text search column: {e}")
+
+        # Trigram indexes so substring ILIKE on title/author can use an index
+        with Session(engine) as session:
+            try:
+                session.exec(text("""
+                    CREATE INDEX IF NOT EXISTS ix_books_title_trgm
+                    ON books USING gin (title gin_trgm_ops)
+                """))
+                session.exec(text("""
+                    CREATE INDEX IF NOT EXISTS ix_books_author_trgm
+                    ON books USING gin (author gin_trgm_ops)
+                """))
+                session.commit()
+                logger.info("Trigram search indexes ensured")
+            except Exception as e:
+                logger.warning(f"Could not create trigram search indexes: {e}")
+
 
-def get_session():
-    with Session(engine) as session:
+async def get_async_session():
+    async with async_session_maker() as session:
         yield session
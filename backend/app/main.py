@@ -1,14 +1,21 @@
+import asyncio
 import logging
-import os
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+import orjson
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlmodel import Session, select
 
-from .database import create_db_and_tables, engine
+from .database import async_engine, create_db_and_tables, engine
 from .routers import books_router, search_router, import_export_router
-from .config import get_settings
+from .services.http_client import close_http_client
+from .services.categorization import close_categorization_service
+from .services.embedding_service import query_cache_stats
+from .services.googlebooks import GoogleBooksService
+from .services.openlibrary import OpenLibraryService
+from .config import CATEGORIES, CORS_ORIGINS, FORMATS, MOODS, READING_STATUSES, get_settings
 
 # Configure logging
 logging.basicConfig(
@@ -20,32 +27,31 @@ logger = logging.getLogger(__name__)
 
 def sync_vector_store():
     """Sync embeddings for books that don't have them (pgvector)."""
-    if os.environ.get("DISABLE_EMBEDDINGS") == "true":
+    if get_settings().DISABLE_EMBEDDINGS:
         logger.info("Embeddings disabled, skipping vector store sync")
         return
 
     try:
-        from .services.vector_store import VectorStore
+        from .services.vector_store import get_vector_store
         from .models.book import Book
         from sqlalchemy import func
 
-        vector_store = VectorStore()
+        vector_store = get_vector_store()
 
-        # Count books with and without embeddings
+        # Collect the ids still missing an embedding so the sync only
+        # touches those rows
         with Session(engine) as session:
-            total_books = session.exec(
-                select(func.count()).select_from(Book)
-            ).one()
-            books_with_embeddings = session.exec(
-                select(func.count()).select_from(Book).where(Book.embedding.isnot(None))
-            ).one()
+            total_books = session.exec(select(func.count()).select_from(Book)).one()
+            missing_ids = list(session.exec(
+                select(Book.id).where(Book.embedding.is_(None)).order_by(Book.id)
+            ).all())
 
-        logger.info(f"Books with embeddings: {books_with_embeddings}/{total_books}")
+        logger.info(f"Books with embeddings: {total_books - len(missing_ids)}/{total_books}")
 
-        if books_with_embeddings < total_books:
+        if missing_ids:
             logger.info("Generating embeddings for books without them...")
             with Session(engine) as session:
-                added = vector_store.sync_from_database(session)
+                added = vector_store.sync_from_database(session, missing_ids)
             logger.info(f"Generated embeddings for {added} books")
         else:
             logger.info("All books have embeddings")
@@ -54,14 +60,45 @@ def sync_vector_store():
         logger.warning(f"Failed to sync vector store: {e}", exc_info=True)
 
 
+def preload_embedding_model():
+    """Load the embedding model and run one encode so the first request doesn't pay for it."""
+    if get_settings().DISABLE_EMBEDDINGS:
+        return
+
+    try:
+        from .services.embedding_service import get_embedding_service
+
+        # The first forward pass also builds ONNX Runtime's optimized graph
+        get_embedding_service().model.encode(["warmup"])
+        logger.info("Embedding model loaded")
+    except Exception as e:
+        logger.warning(f"Failed to preload embedding model: {e}", exc_info=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: create database tables
     create_db_and_tables()
-    # Sync vector store with database (for Railway deployments where ChromaDB is wiped)
-    sync_vector_store()
+    # Load the embedding model before serving so the first search/import is fast
+    await asyncio.to_thread(preload_embedding_model)
+    # Backfill missing embeddings in the background so the API accepts requests immediately
+    app.state.sync_task = asyncio.create_task(asyncio.to_thread(sync_vector_store))
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: give the backfill a moment to finish its current batch
+    try:
+        await asyncio.wait_for(app.state.sync_task, timeout=5)
+    except asyncio.TimeoutError:
+        logger.warning("Vector store sync still running at shutdown")
+    await close_http_client()
+    await close_categorization_service()
+    await async_engine.dispose()
+
+
+class OrjsonResponse(JSONResponse):
+    """JSONResponse encoded with orjson (FastAPI's own ORJSONResponse is deprecated)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
 
 
 app = FastAPI(
@@ -69,16 +106,17 @@ app = FastAPI(
     description="A personal library database with RAG-powered search",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=OrjsonResponse,
 )
 
 # Configure CORS
-settings = get_settings()
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS,
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
@@ -88,18 +126,42 @@ app.include_router(import_export_router)
 
 
 @app.get("/api/health")
-def health_check():
+def health_check(request: Request):
     """Health check endpoint."""
-    return {"status": "healthy", "version": "1.0.0"}
+    sync_task = getattr(request.app.state, "sync_task", None)
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+        "embeddings_synced": sync_task is not None and sync_task.done(),
+    }
+
+
+@app.get("/api/metrics")
+def metrics():
+    """Rate limiter and cache state (this worker only)."""
+    return {
+        "rate_limits": {
+            "open_library": OpenLibraryService.limiter.stats(),
+            "google_books": GoogleBooksService.limiter.stats(),
+        },
+        "query_embedding_cache": query_cache_stats(),
+    }
+
+
+# Config is fixed for the lifetime of the process, so serialize it once
+CONFIG_JSON = orjson.dumps({
+    "categories": CATEGORIES,
+    "moods": MOODS,
+    "formats": FORMATS,
+    "reading_statuses": READING_STATUSES,
+})
 
 
 @app.get("/api/config")
 def get_config():
     """Get available categories, moods, formats, and statuses."""
-    settings = get_settings()
-    return {
-        "categories": settings.CATEGORIES,
-        "moods": settings.MOODS,
-        "formats": settings.FORMATS,
-        "reading_statuses": settings.READING_STATUSES,
-    }
+    return Response(
+        content=CONFIG_JSON,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=3600"},
+    )
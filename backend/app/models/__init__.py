@@ -1,3 +1,3 @@
-from .book import Book, BookCategory, BookMood, BookCreate, BookUpdate, BookRead
+from .book import Book, BookCategory, BookMood, BookCreate, BookUpdate, BookRead, EmbeddingCache
 
-__all__ = ["Book", "BookCategory", "BookMood", "BookCreate", "BookUpdate", "BookRead"]
+__all__ = ["Book", "BookCategory", "BookMood", "BookCreate", "BookUpdate", "BookRead", "EmbeddingCache"]
@@ -2,8 +2,9 @@ from datetime import date, datetime
 from typing import Optional, Any
 
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column
-from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, Index, func
+from sqlalchemy.orm import declared_attr, deferred
+from pgvector.sqlalchemy import HALFVEC
 
 # Embedding dimension for all-MiniLM-L6-v2 model
 EMBEDDING_DIM = 384
@@ -12,9 +13,10 @@ EMBEDDING_DIM = 384
 # Database Models
 class BookCategory(SQLModel, table=True):
     __tablename__ = "book_categories"
+    __table_args__ = (Index("ix_book_categories_category", "category"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    book_id: int = Field(foreign_key="books.id", ondelete="CASCADE")
+    book_id: int = Field(foreign_key="books.id", ondelete="CASCADE", index=True)
     category: str = Field(max_length=50)
 
     book: Optional["Book"] = Relationship(back_populates="categories")
@@ -22,9 +24,10 @@ class BookCategory(SQLModel, table=True):
 
 class BookMood(SQLModel, table=True):
     __tablename__ = "book_moods"
+    __table_args__ = (Index("ix_book_moods_mood", "mood"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    book_id: int = Field(foreign_key="books.id", ondelete="CASCADE")
+    book_id: int = Field(foreign_key="books.id", ondelete="CASCADE", index=True)
     mood: str = Field(max_length=50)
 
     book: Optional["Book"] = Relationship(back_populates="moods")
@@ -32,6 +35,18 @@ class BookMood(SQLModel, table=True):
 
 class Book(SQLModel, table=True):
     __tablename__ = "books"
+    # Indexes backing the list_books filters and its created_at DESC ordering
+    __table_args__ = (
+        Index("ix_books_created_at", "created_at"),
+        Index("ix_books_status_created", "reading_status", "created_at"),
+        Index("ix_books_format", "format"),
+    )
+
+    # Don't load the embedding with regular book reads; only vector search
+    # needs it, and it does so in SQL
+    @declared_attr.directive
+    def __mapper_args__(cls):
+        return {"properties": {"embedding": deferred(cls.__table__.c.embedding)}}
 
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(max_length=500)
@@ -47,20 +62,63 @@ class Book(SQLModel, table=True):
     notes: Optional[str] = Field(default=None)
     cover_url: Optional[str] = Field(default=None, max_length=500)
     page_count: Optional[int] = Field(default=None)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Timestamps are stamped by the database on INSERT/UPDATE. The INSERT
+    # also sends now() itself, for tables created before the server default
+    # existed (SQLite can't add one to an existing column)
+    created_at: Optional[datetime] = Field(
+        default=None,
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"default": func.now(), "server_default": func.now(), "nullable": False},
+    )
+    updated_at: Optional[datetime] = Field(
+        default=None,
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={
+            "default": func.now(),
+            "server_default": func.now(),
+            "onupdate": func.now(),
+            "nullable": False,
+        },
+    )
 
-    # Vector embedding for semantic search (384 dimensions for all-MiniLM-L6-v2)
-    embedding: Optional[Any] = Field(default=None, sa_column=Column(Vector(EMBEDDING_DIM)))
+    # Vector embedding for semantic search (384 dimensions for all-MiniLM-L6-v2),
+    # stored as half precision to halve row width and index size
+    embedding: Optional[Any] = Field(default=None, sa_column=Column(HALFVEC(EMBEDDING_DIM)))
+    # Hash of the text the embedding was generated from, so unchanged books
+    # aren't re-encoded
+    embedding_text_hash: Optional[str] = Field(default=None, max_length=32)
 
+    # lazy="raise": tags must be eager-loaded (selectinload/joinedload), so a
+    # missed loader option fails loudly instead of issuing a query per book.
+    # passive_deletes: the ON DELETE CASCADE foreign keys remove tag rows.
     categories: list[BookCategory] = Relationship(
-        back_populates="book", sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+        back_populates="book",
+        sa_relationship_kwargs={
+            "cascade": "all, delete-orphan",
+            "lazy": "raise",
+            "passive_deletes": True,
+        },
     )
     moods: list[BookMood] = Relationship(
-        back_populates="book", sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+        back_populates="book",
+        sa_relationship_kwargs={
+            "cascade": "all, delete-orphan",
+            "lazy": "raise",
+            "passive_deletes": True,
+        },
     )
 
 
+class EmbeddingCache(SQLModel, table=True):
+    """Embeddings by the hash of the text they were generated from, per model."""
+
+    __tablename__ = "embedding_cache"
+
+    text_hash: str = Field(primary_key=True, max_length=32)
+    model: str = Field(primary_key=True, max_length=100)
+    embedding: Any = Field(sa_column=Column(HALFVEC(EMBEDDING_DIM), nullable=False))
+
+
 # Pydantic Schemas for API
 class BookCreate(SQLModel):
     title: str
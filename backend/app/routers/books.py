@@ -1,18 +1,29 @@
+import asyncio
 import logging
 import re
-from datetime import datetime
 from typing import Optional
 from collections import defaultdict
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
-from sqlmodel import Session, select
-from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import and_, delete, exists, func, insert, literal_column, or_
+from sqlalchemy.orm import joinedload, selectinload
 
-from ..database import get_session
+from ..database import async_session_maker, db_url, get_async_session
 
 logger = logging.getLogger(__name__)
 
+# Compiled once; normalize_name runs twice per book in find_duplicates
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_WORD_RE = re.compile(r"\w+")
+
+# Concurrent Groq calls during batch recategorization
+RECATEGORIZE_CONCURRENCY = 8
+# Books loaded into the session at once during batch recategorization
+RECATEGORIZE_CHUNK_SIZE = 50
+
 
 def normalize_name(name: str) -> str:
     """Normalize a name for comparison by removing punctuation and extra spaces."""
@@ -21,7 +32,7 @@ def normalize_name(name: str) -> str:
     # Lowercase
     name = name.lower()
     # Remove punctuation
-    name = re.sub(r'[^\w\s]', '', name)
+    name = _PUNCT_RE.sub('', name)
     # Normalize whitespace
     name = ' '.join(name.split())
     return name
@@ -34,16 +45,26 @@ from ..models.book import (
     BookRead,
     BookLookupResult,
 )
-from ..services.openlibrary import OpenLibraryService
-from ..services.categorization import CategorizationService
-from ..services.vector_store import VectorStore
+from ..services.openlibrary import OpenLibraryService, get_openlibrary_service
+from ..services.categorization import CategorizationService, get_categorization_service
+from ..services.vector_store import VectorStore, get_vector_store
+from ..services.library_version import bump_library_version
 
 router = APIRouter(prefix="/api/books", tags=["books"])
 
 
-def book_to_read(book: Book) -> BookRead:
-    """Convert a Book model to BookRead schema."""
-    return BookRead(
+def book_to_read(
+    book: Book,
+    categories: Optional[list[str]] = None,
+    moods: Optional[list[str]] = None,
+) -> BookRead:
+    """Convert a Book model to BookRead schema.
+
+    The ORM values are already typed, so model_construct skips re-validating
+    every field (noticeable on large list responses). Pass categories and
+    moods when they are already known to skip the loaded relationships.
+    """
+    return BookRead.model_construct(
         id=book.id,
         title=book.title,
         author=book.author,
@@ -60,23 +81,120 @@ def book_to_read(book: Book) -> BookRead:
         page_count=book.page_count,
         created_at=book.created_at,
         updated_at=book.updated_at,
-        categories=[c.category for c in book.categories],
-        moods=[m.mood for m in book.moods],
+        categories=[c.category for c in book.categories] if categories is None else categories,
+        moods=[m.mood for m in book.moods] if moods is None else moods,
+    )
+
+
+async def insert_book_tags(
+    session: AsyncSession,
+    book_id: int,
+    categories: Optional[list[str]] = None,
+    moods: Optional[list[str]] = None,
+) -> None:
+    """Bulk-insert category and mood rows for a book (one executemany per table)."""
+    if categories:
+        await session.exec(
+            insert(BookCategory),
+            params=[{"book_id": book_id, "category": cat} for cat in categories],
+        )
+    if moods:
+        await session.exec(
+            insert(BookMood),
+            params=[{"book_id": book_id, "mood": mood} for mood in moods],
+        )
+
+
+async def replace_book_tags(
+    session: AsyncSession,
+    book_id: int,
+    categories: Optional[list[str]] = None,
+    moods: Optional[list[str]] = None,
+) -> None:
+    """Replace a book's categories and/or moods. None leaves that relation untouched."""
+    # The old rows are replaced wholesale, so skip syncing them in the session
+    if categories is not None:
+        await session.exec(
+            delete(BookCategory)
+            .where(BookCategory.book_id == book_id)
+            .execution_options(synchronize_session=False)
+        )
+    if moods is not None:
+        await session.exec(
+            delete(BookMood)
+            .where(BookMood.book_id == book_id)
+            .execution_options(synchronize_session=False)
+        )
+    await insert_book_tags(session, book_id, categories, moods)
+
+
+async def load_book(session: AsyncSession, book_id: int) -> Optional[Book]:
+    """
+    Load a book with its categories and moods.
+
+    Relationships are loaded eagerly because an AsyncSession can't lazy-load;
+    populate_existing refreshes a book already in the session after an update.
+    For a single book the handful of tag rows come back in the same query via
+    joins (selectinload would cost two more round trips).
+    """
+    result = await session.exec(
+        select(Book)
+        .where(Book.id == book_id)
+        .options(joinedload(Book.categories), joinedload(Book.moods))
+        .execution_options(populate_existing=True)
+    )
+    return result.unique().first()
+
+
+def search_filter(search: str):
+    """Build the WHERE clause for the library search box.
+
+    On PostgreSQL this matches against the indexed `search_vec` column, with
+    every word treated as a prefix so partially typed terms still match, or
+    a substring of the title/author (served by the pg_trgm indexes). SQLite
+    has neither, so it falls back to substring ILIKE on all three columns.
+    """
+    search_term = f"%{search}%"
+
+    if db_url.startswith("postgresql"):
+        conditions = [Book.title.ilike(search_term), Book.author.ilike(search_term)]
+        words = _WORD_RE.findall(search)
+        if words:
+            tsquery = " & ".join(f"{word}:*" for word in words)
+            conditions.append(
+                literal_column("books.search_vec").op("@@")(func.to_tsquery("simple", tsquery))
+            )
+        return or_(*conditions)
+
+    return (
+        (Book.title.ilike(search_term))
+        | (Book.author.ilike(search_term))
+        | (Book.description.ilike(search_term))
     )
 
 
 @router.get("", response_model=list[BookRead])
-def list_books(
-    session: Session = Depends(get_session),
+async def list_books(
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
     skip: int = Query(0, ge=0),
-    limit: int = Query(10000, ge=1, le=10000),
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[int] = Query(None, description="Return books after this book id (from X-Next-Cursor)"),
     category: Optional[str] = None,
     mood: Optional[str] = None,
     format: Optional[str] = None,
     reading_status: Optional[str] = None,
     search: Optional[str] = None,
 ):
-    """List books with optional filters."""
+    """
+    List books with optional filters, newest first, a page at a time.
+
+    Pass the X-Next-Cursor header of a full page back as `cursor` to fetch
+    the next page by keyset instead of a growing OFFSET.
+    """
+    if cursor is not None and skip:
+        raise HTTPException(status_code=400, detail="Use either skip or cursor, not both")
+
     query = select(Book).options(
         selectinload(Book.categories),
         selectinload(Book.moods)
@@ -95,15 +213,25 @@ def list_books(
         query = query.where(Book.reading_status == reading_status)
 
     if search:
-        search_term = f"%{search}%"
+        query = query.where(search_filter(search))
+
+    if cursor is not None:
+        # Rows strictly after the cursor book in (created_at DESC, id DESC) order;
+        # the anchor timestamp is read in SQL so it compares in the stored format
+        anchor = select(Book.created_at).where(Book.id == cursor).scalar_subquery()
         query = query.where(
-            (Book.title.ilike(search_term))
-            | (Book.author.ilike(search_term))
-            | (Book.description.ilike(search_term))
+            or_(
+                Book.created_at < anchor,
+                and_(Book.created_at == anchor, Book.id < cursor),
+            )
         )
 
-    query = query.offset(skip).limit(limit).order_by(Book.created_at.desc())
-    books = session.exec(query).unique().all()
+    query = query.offset(skip).limit(limit).order_by(Book.created_at.desc(), Book.id.desc())
+    result = await session.exec(query)
+    books = result.unique().all()
+
+    if len(books) == limit:
+        response.headers["X-Next-Cursor"] = str(books[-1].id)
 
     return [book_to_read(book) for book in books]
 
@@ -120,27 +248,87 @@ class DuplicatesResponse(BaseModel):
     total_duplicates: int
 
 
+# Last duplicates scan, as ((book count, max updated_at), response). Reused
+# until a write changes the key or invalidate_library_caches() drops it.
+_duplicates_cache: Optional[tuple[tuple, DuplicatesResponse]] = None
+
+
+def invalidate_library_caches() -> None:
+    """
+    Drop results derived from the library after books or their tags change:
+    the cached duplicates scan, and (via the library version) RAG answers.
+    """
+    global _duplicates_cache
+    _duplicates_cache = None
+    bump_library_version()
+
+
 @router.get("/duplicates", response_model=DuplicatesResponse)
-def find_duplicates(session: Session = Depends(get_session)):
+async def find_duplicates(session: AsyncSession = Depends(get_async_session)):
     """Find duplicate books based on normalized title+author or ISBN."""
-    books = session.exec(select(Book)).unique().all()
+    global _duplicates_cache
+
+    # Edits bump max(updated_at) and deletes change the count, so writes made
+    # by other workers are picked up as well
+    result = await session.exec(select(func.count(Book.id), func.max(Book.updated_at)))
+    cache_key = tuple(result.one())
+    if _duplicates_cache is not None and _duplicates_cache[0] == cache_key:
+        return _duplicates_cache[1]
+
+    # ISBN duplicates are grouped in SQL (ISBN normalized by stripping hyphens and spaces)
+    isbn_key = func.replace(func.replace(Book.isbn, "-", ""), " ", "")
+    dup_isbns = (
+        select(isbn_key)
+        .where(Book.isbn.isnot(None), isbn_key != "")
+        .group_by(isbn_key)
+        .having(func.count() > 1)
+    )
+    result = await session.exec(
+        select(Book.id, isbn_key).where(isbn_key.in_(dup_isbns)).order_by(Book.id)
+    )
+    isbn_group_ids: dict[str, list[int]] = defaultdict(list)
+    for book_id, normalized_isbn in result.all():
+        isbn_group_ids[normalized_isbn].append(book_id)
+
+    # Title/author normalization strips punctuation, which has no portable SQL
+    # equivalent, so group in Python over just the id/title/author columns
+    result = await session.exec(select(Book.id, Book.title, Book.author).order_by(Book.id))
+    # Keyed on the (title, author) tuple; the display string is only built
+    # for the groups that are actually reported
+    title_author_group_ids: dict[tuple[str, str], list[int]] = defaultdict(list)
+    for book_id, title, author in result.all():
+        title_author_group_ids[(normalize_name(title), normalize_name(author))].append(book_id)
+    # Most books are unique; drop singleton groups before any further work
+    title_author_group_ids = {
+        key: ids for key, ids in title_author_group_ids.items() if len(ids) > 1
+    }
+
+    # Load full books (with tags) only for ids that appear in a duplicate group
+    duplicate_ids = {
+        book_id
+        for groups in (isbn_group_ids, title_author_group_ids)
+        for ids in groups.values()
+        for book_id in ids
+    }
+    books_by_id: dict[int, Book] = {}
+    if duplicate_ids:
+        result = await session.exec(
+            select(Book)
+            .where(Book.id.in_(duplicate_ids))
+            .options(selectinload(Book.categories), selectinload(Book.moods))
+        )
+        books_by_id = {book.id: book for book in result.all()}
 
     # Group by normalized title+author
-    title_author_groups: dict[str, list[Book]] = defaultdict(list)
+    title_author_groups: dict[tuple[str, str], list[Book]] = {
+        key: [books_by_id[book_id] for book_id in ids if book_id in books_by_id]
+        for key, ids in title_author_group_ids.items()
+    }
     # Group by ISBN
-    isbn_groups: dict[str, list[Book]] = defaultdict(list)
-
-    for book in books:
-        # Title + Author grouping
-        key = f"{normalize_name(book.title)}|{normalize_name(book.author)}"
-        title_author_groups[key].append(book)
-
-        # ISBN grouping (if ISBN exists)
-        if book.isbn:
-            # Normalize ISBN (remove hyphens and spaces)
-            normalized_isbn = re.sub(r'[\s-]', '', book.isbn)
-            if normalized_isbn:
-                isbn_groups[normalized_isbn].append(book)
+    isbn_groups: dict[str, list[Book]] = {
+        isbn: [books_by_id[book_id] for book_id in ids if book_id in books_by_id]
+        for isbn, ids in isbn_group_ids.items()
+    }
 
     # Collect duplicate groups (more than 1 book)
     seen_book_ids: set[int] = set()
@@ -149,48 +337,55 @@ def find_duplicates(session: Session = Depends(get_session)):
     # First, add ISBN-based duplicates (higher confidence)
     for isbn, group_books in isbn_groups.items():
         if len(group_books) > 1:
-            book_ids = {b.id for b in group_books}
-            if not book_ids.issubset(seen_book_ids):
+            # Stops at the first book not already reported
+            if any(b.id not in seen_book_ids for b in group_books):
                 duplicate_groups.append(DuplicateGroup(
                     key=f"ISBN: {isbn}",
                     books=[book_to_read(b) for b in group_books]
                 ))
-                seen_book_ids.update(book_ids)
+                seen_book_ids.update(b.id for b in group_books)
 
     # Then, add title+author duplicates (not already found by ISBN)
-    for key, group_books in title_author_groups.items():
+    for (title, author), group_books in title_author_groups.items():
         if len(group_books) > 1:
             # Filter out books already in an ISBN group
             remaining_books = [b for b in group_books if b.id not in seen_book_ids]
             if len(remaining_books) > 1:
                 duplicate_groups.append(DuplicateGroup(
-                    key=f"Title+Author: {key}",
+                    key=f"Title+Author: {title}|{author}",
                     books=[book_to_read(b) for b in remaining_books]
                 ))
                 seen_book_ids.update(b.id for b in remaining_books)
 
     total_duplicates = sum(len(g.books) - 1 for g in duplicate_groups)
 
-    return DuplicatesResponse(
+    response = DuplicatesResponse(
         duplicate_groups=duplicate_groups,
         total_duplicates=total_duplicates
     )
+    _duplicates_cache = (cache_key, response)
+    return response
 
 
 @router.get("/lookup", response_model=BookLookupResult)
-async def lookup_book(isbn: str):
-    """Look up book metadata from Open Library by ISBN."""
-    service = OpenLibraryService()
-    result = await service.fetch_book_metadata(isbn)
+async def lookup_book(
+    isbn: str,
+    refresh: bool = False,
+    openlibrary: OpenLibraryService = Depends(get_openlibrary_service),
+):
+    """Look up book metadata from Open Library by ISBN (refresh=true bypasses the cache)."""
+    if refresh:
+        openlibrary.invalidate(isbn)
+    result = await openlibrary.fetch_book_metadata(isbn)
     if not result:
         raise HTTPException(status_code=404, detail="Book not found")
     return result
 
 
 @router.get("/{book_id}", response_model=BookRead)
-def get_book(book_id: int, session: Session = Depends(get_session)):
+async def get_book(book_id: int, session: AsyncSession = Depends(get_async_session)):
     """Get a single book by ID."""
-    book = session.get(Book, book_id)
+    book = await load_book(session, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     return book_to_read(book)
@@ -199,7 +394,9 @@ def get_book(book_id: int, session: Session = Depends(get_session)):
 @router.post("", response_model=BookRead, status_code=201)
 async def create_book(
     book_data: BookCreate,
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_async_session),
+    vector_store: VectorStore = Depends(get_vector_store),
     auto_categorize: bool = Query(True, description="Auto-suggest categories and moods"),
 ):
     """Create a new book. Optionally auto-categorize using AI."""
@@ -220,8 +417,7 @@ async def create_book(
         page_count=book_data.page_count,
     )
     session.add(book)
-    session.commit()
-    session.refresh(book)
+    await session.flush()
 
     # Get categories and moods
     categories = book_data.categories
@@ -229,54 +425,62 @@ async def create_book(
 
     logger.info(f"Creating book '{book.title}': auto_categorize={auto_categorize}, categories={categories}, moods={moods}")
 
-    # Auto-categorize if enabled and no categories/moods provided
+    # Add categories and moods
+    await insert_book_tags(session, book.id, categories, moods)
+
+    await session.commit()
+    invalidate_library_caches()
+    book = await load_book(session, book.id)
+
+    # Auto-categorize if enabled and no categories/moods provided. The LLM call
+    # runs after the response is sent; the embedding is generated once the
+    # tags are in, since they are part of the embedded text.
     if auto_categorize and not categories and not moods:
+        background_tasks.add_task(finalize_new_book, book.id, vector_store)
+    else:
+        logger.info(f"Skipping auto-categorization: auto_categorize={auto_categorize}, has_categories={bool(categories)}, has_moods={bool(moods)}")
+        background_tasks.add_task(vector_store.embed_book, book.id)
+
+    return book_to_read(book)
+
+
+async def finalize_new_book(book_id: int, vector_store: VectorStore) -> None:
+    """Auto-categorize a newly created book in its own session, then embed it."""
+    async with async_session_maker() as session:
+        book = await session.get(Book, book_id)
+        if not book:
+            return
+
         logger.info(f"Auto-categorizing book '{book.title}'...")
         try:
-            categorization = CategorizationService()
+            categorization = get_categorization_service()
             suggestions = await categorization.categorize_book(
                 book.title, book.author, book.description or ""
             )
             categories = suggestions.get("categories", [])
             moods = suggestions.get("moods", [])
             logger.info(f"Auto-categorization result: categories={categories}, moods={moods}")
+
+            await insert_book_tags(session, book_id, categories, moods)
+            await session.commit()
+            invalidate_library_caches()
         except Exception:
             logger.warning(f"Auto-categorization failed for book '{book.title}'", exc_info=True)
-    else:
-        logger.info(f"Skipping auto-categorization: auto_categorize={auto_categorize}, has_categories={bool(categories)}, has_moods={bool(moods)}")
 
-    # Add categories
-    for cat in categories:
-        book_cat = BookCategory(book_id=book.id, category=cat)
-        session.add(book_cat)
-
-    # Add moods
-    for mood in moods:
-        book_mood = BookMood(book_id=book.id, mood=mood)
-        session.add(book_mood)
-
-    # Generate and store embedding
-    try:
-        vector_store = VectorStore()
-        embedding = vector_store.add_book(book, categories, moods)
-        book.embedding = embedding
-    except Exception:
-        logger.warning(f"Failed to generate embedding for book {book.id}", exc_info=True)
-
-    session.commit()
-    session.refresh(book)
-
-    return book_to_read(book)
+    # Encoding is CPU-bound; keep it off the event loop
+    await asyncio.to_thread(vector_store.embed_book, book_id)
 
 
 @router.patch("/{book_id}", response_model=BookRead)
-def update_book(
+async def update_book(
     book_id: int,
     book_data: BookUpdate,
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_async_session),
+    vector_store: VectorStore = Depends(get_vector_store),
 ):
     """Update a book."""
-    book = session.get(Book, book_id)
+    book = await session.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -288,40 +492,20 @@ def update_book(
     for key, value in update_data.items():
         setattr(book, key, value)
 
-    book.updated_at = datetime.utcnow()
+    # updated_at is stamped by onupdate when a column changes; otherwise
+    # (e.g. a tags-only edit) touch the row so the database still stamps it
+    if not session.is_modified(book):
+        book.updated_at = func.now()
 
-    # Update categories if provided
-    if categories is not None:
-        # Delete existing categories
-        for cat in book.categories:
-            session.delete(cat)
-        # Add new categories
-        for cat in categories:
-            book_cat = BookCategory(book_id=book.id, category=cat)
-            session.add(book_cat)
-
-    # Update moods if provided
-    if moods is not None:
-        # Delete existing moods
-        for mood in book.moods:
-            session.delete(mood)
-        # Add new moods
-        for mood in moods:
-            book_mood = BookMood(book_id=book.id, mood=mood)
-            session.add(book_mood)
-
-    # Update embedding
-    try:
-        vector_store = VectorStore()
-        final_categories = categories if categories is not None else [c.category for c in book.categories]
-        final_moods = moods if moods is not None else [m.mood for m in book.moods]
-        embedding = vector_store.update_book(book, final_categories, final_moods)
-        book.embedding = embedding
-    except Exception:
-        logger.warning(f"Failed to update embedding for book {book.id}", exc_info=True)
+    # Update categories and moods if provided
+    await replace_book_tags(session, book.id, categories, moods)
+
+    await session.commit()
+    invalidate_library_caches()
+    book = await load_book(session, book.id)
 
-    session.commit()
-    session.refresh(book)
+    # Update embedding after the response is sent
+    background_tasks.add_task(vector_store.embed_book, book.id)
 
     return book_to_read(book)
 
@@ -329,11 +513,15 @@ def update_book(
 @router.post("/{book_id}/categorize", response_model=BookRead)
 async def categorize_book(
     book_id: int,
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_async_session),
+    vector_store: VectorStore = Depends(get_vector_store),
+    categorization: CategorizationService = Depends(get_categorization_service),
+    openlibrary: OpenLibraryService = Depends(get_openlibrary_service),
     fetch_description: bool = Query(True, description="Fetch description from Open Library if missing"),
 ):
     """Auto-categorize a book using AI. Optionally fetches description from Open Library."""
-    book = session.get(Book, book_id)
+    book = await session.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -345,7 +533,6 @@ async def categorize_book(
         if fetch_description and not description:
             logger.info(f"Fetching description from Open Library for '{book.title}'...")
             try:
-                openlibrary = OpenLibraryService()
                 if book.isbn:
                     metadata = await openlibrary.fetch_book_metadata(book.isbn)
                     if metadata and metadata.description:
@@ -363,7 +550,6 @@ async def categorize_book(
             except Exception as e:
                 logger.warning(f"Failed to fetch description for '{book.title}': {e}")
 
-        categorization = CategorizationService()
         suggestions = await categorization.categorize_book(
             book.title, book.author, description
         )
@@ -374,34 +560,18 @@ async def categorize_book(
         if not categories and not moods:
             raise HTTPException(status_code=500, detail="AI categorization returned no results")
 
-        # Delete existing categories and moods
-        for cat in book.categories:
-            session.delete(cat)
-        for mood in book.moods:
-            session.delete(mood)
+        # Replace existing categories and moods
+        await replace_book_tags(session, book.id, categories, moods)
 
-        # Add new categories
-        for cat in categories:
-            book_cat = BookCategory(book_id=book.id, category=cat)
-            session.add(book_cat)
+        # Only tag rows changed; touch the book so the database stamps updated_at
+        book.updated_at = func.now()
 
-        # Add new moods
-        for mood in moods:
-            book_mood = BookMood(book_id=book.id, mood=mood)
-            session.add(book_mood)
-
-        book.updated_at = datetime.utcnow()
-
-        # Update embedding
-        try:
-            vector_store = VectorStore()
-            embedding = vector_store.update_book(book, categories, moods)
-            book.embedding = embedding
-        except Exception:
-            logger.warning(f"Failed to update embedding for book {book.id}", exc_info=True)
+        await session.commit()
+        invalidate_library_caches()
+        book = await load_book(session, book.id)
 
-        session.commit()
-        session.refresh(book)
+        # Update embedding after the response is sent
+        background_tasks.add_task(vector_store.embed_book, book.id)
 
         return book_to_read(book)
 
@@ -422,7 +592,10 @@ class RecategorizeResponse(BaseModel):
 
 @router.post("/recategorize", response_model=RecategorizeResponse)
 async def recategorize_all_books(
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_async_session),
+    vector_store: VectorStore = Depends(get_vector_store),
+    categorization: CategorizationService = Depends(get_categorization_service),
     force: bool = Query(False, description="Re-categorize even books that already have categories/moods"),
     limit: int = Query(100, ge=1, le=500, description="Max books to process (to avoid timeout)"),
 ):
@@ -435,84 +608,94 @@ async def recategorize_all_books(
     This endpoint is rate-limited by the Groq API free tier.
     Process in batches of 50-100 to avoid timeouts.
     """
-    query = select(Book).options(
-        selectinload(Book.categories),
-        selectinload(Book.moods)
-    )
+    # Select ids only; books are loaded a chunk at a time below
+    query = select(Book.id)
 
     if not force:
-        # Only get books missing categories or moods
-        query = query.outerjoin(BookCategory).outerjoin(BookMood).where(
-            (BookCategory.id.is_(None)) | (BookMood.id.is_(None))
+        # Only get books missing categories or moods (anti-joins, one row per book)
+        query = query.where(
+            or_(
+                ~exists().where(BookCategory.book_id == Book.id),
+                ~exists().where(BookMood.book_id == Book.id),
+            )
         )
 
-    query = query.limit(limit)
-    books = session.exec(query).unique().all()
+    query = query.order_by(Book.id).limit(limit)
+    result = await session.exec(query)
+    book_ids = result.all()
 
-    total = len(books)
+    total = len(book_ids)
     updated = 0
     failed = 0
     skipped = 0
+    updated_ids: list[int] = []
 
-    categorization = CategorizationService()
-    vector_store = VectorStore()
-
-    for book in books:
-        try:
-            # Skip if already has both categories and moods (unless force)
-            if not force and book.categories and book.moods:
-                skipped += 1
-                continue
+    # The LLM calls are I/O-bound, so run them concurrently (bounded to stay
+    # within Groq rate limits); DB writes are applied serially afterwards
+    semaphore = asyncio.Semaphore(RECATEGORIZE_CONCURRENCY)
 
+    async def suggest(book: Book) -> dict:
+        async with semaphore:
             logger.info(f"Re-categorizing book '{book.title}'...")
-            suggestions = await categorization.categorize_book(
+            return await categorization.categorize_book(
                 book.title, book.author, book.description or ""
             )
-            categories = suggestions.get("categories", [])
-            moods = suggestions.get("moods", [])
 
-            if not categories and not moods:
-                logger.warning(f"No categories/moods returned for '{book.title}'")
-                failed += 1
-                continue
+    for start in range(0, total, RECATEGORIZE_CHUNK_SIZE):
+        result = await session.exec(
+            select(Book)
+            .where(Book.id.in_(book_ids[start:start + RECATEGORIZE_CHUNK_SIZE]))
+            .options(selectinload(Book.categories), selectinload(Book.moods))
+            .order_by(Book.id)
+        )
+        books = result.all()
 
-            # Delete existing categories and moods
-            for cat in book.categories:
-                session.delete(cat)
-            for mood in book.moods:
-                session.delete(mood)
+        # Skip books that already have both categories and moods (unless force)
+        pending = [book for book in books if force or not (book.categories and book.moods)]
+        skipped += len(books) - len(pending)
 
-            # Add new categories
-            for cat in categories:
-                book_cat = BookCategory(book_id=book.id, category=cat)
-                session.add(book_cat)
+        results = await asyncio.gather(*(suggest(book) for book in pending), return_exceptions=True)
 
-            # Add new moods
-            for mood in moods:
-                book_mood = BookMood(book_id=book.id, mood=mood)
-                session.add(book_mood)
+        for book, suggestions in zip(pending, results):
+            try:
+                if isinstance(suggestions, BaseException):
+                    raise suggestions
 
-            book.updated_at = datetime.utcnow()
+                categories = suggestions.get("categories", [])
+                moods = suggestions.get("moods", [])
 
-            # Update embedding with new categories/moods
-            try:
-                embedding = vector_store.update_book(book, categories, moods)
-                book.embedding = embedding
-            except Exception:
-                logger.warning(f"Failed to update embedding for book {book.id}", exc_info=True)
+                if not categories and not moods:
+                    logger.warning(f"No categories/moods returned for '{book.title}'")
+                    failed += 1
+                    continue
+
+                # Replace existing categories and moods
+                await replace_book_tags(session, book.id, categories, moods)
+
+                # Only tag rows changed; touch the book so the database stamps updated_at
+                book.updated_at = func.now()
+
+                updated_ids.append(book.id)
+                updated += 1
 
-            updated += 1
+                # Commit every 10 books to avoid losing progress
+                if updated % 10 == 0:
+                    await session.commit()
+                    logger.info(f"Progress: {updated}/{total} books updated")
 
-            # Commit every 10 books to avoid losing progress
-            if updated % 10 == 0:
-                session.commit()
-                logger.info(f"Progress: {updated}/{total} books updated")
+            except Exception as e:
+                logger.error(f"Failed to re-categorize book {book.id}: {e}", exc_info=True)
+                failed += 1
+
+        # Release this chunk's books so the identity map stays bounded
+        await session.commit()
+        session.expunge_all()
 
-        except Exception as e:
-            logger.error(f"Failed to re-categorize book {book.id}: {e}", exc_info=True)
-            failed += 1
+    invalidate_library_caches()
 
-    session.commit()
+    # Re-embed the updated books (new categories/moods) after the response is sent
+    if updated_ids:
+        background_tasks.add_task(vector_store.embed_books, updated_ids)
 
     return RecategorizeResponse(
         total=total,
@@ -523,19 +706,23 @@ async def recategorize_all_books(
 
 
 @router.delete("/{book_id}", status_code=204)
-def delete_book(book_id: int, session: Session = Depends(get_session)):
+async def delete_book(
+    book_id: int,
+    session: AsyncSession = Depends(get_async_session),
+    vector_store: VectorStore = Depends(get_vector_store),
+):
     """Delete a book."""
-    book = session.get(Book, book_id)
-    if not book:
+    # Single DELETE; the categories/moods rows go with it via ON DELETE CASCADE
+    result = await session.exec(delete(Book).where(Book.id == book_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Book not found")
 
     # Remove from vector store
     try:
-        vector_store = VectorStore()
         vector_store.delete_book(book_id)
     except Exception:
         logger.warning(f"Failed to delete book {book_id} from vector store", exc_info=True)
 
-    session.delete(book)
-    session.commit()
+    await session.commit()
+    invalidate_library_caches()
     return None
@@ -1,21 +1,32 @@
+import asyncio
+import codecs
 import csv
 import io
 import logging
 import re
 from datetime import date
-from typing import Optional
+from typing import BinaryIO, Iterable, Iterator, Optional
 
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
 from fastapi.responses import StreamingResponse
-from sqlmodel import Session, select
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..database import get_session
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+except ImportError:  # Optional: uploads are parsed with the csv module instead
+    pa = None
+
+from ..database import async_session_maker, get_async_session
 
 logger = logging.getLogger(__name__)
-from ..models.book import Book, BookCategory, BookMood, BookCreate, BookRead
-from ..services.vector_store import VectorStore
-from ..services.enrichment import BookEnrichmentService
-from .books import book_to_read
+from ..models.book import Book, BookCategory, BookCreate, BookMood, BookRead
+from ..services.vector_store import VectorStore, get_vector_store
+from ..services.enrichment import BookEnrichmentService, get_enrichment_service
+from .books import book_to_read, insert_book_tags, invalidate_library_caches
 
 router = APIRouter(prefix="/api", tags=["import/export"])
 
@@ -51,6 +62,10 @@ COLUMN_MAPPINGS = {
     "Bookshelves": "categories",
 }
 
+# Case-insensitive view of COLUMN_MAPPINGS, so each header is resolved with
+# a single lookup
+_COLUMN_MAPPINGS_CI = {col.lower(): field for col, field in COLUMN_MAPPINGS.items()}
+
 # Status mappings for different formats
 STATUS_MAPPINGS = {
     # Standard
@@ -79,14 +94,46 @@ FORMAT_MAPPINGS = {
     "epub": "epub",
 }
 
+# Books fetched per database round trip during CSV export
+EXPORT_BATCH_SIZE = 500
+
+# Bytes of CSV pyarrow reads (and converts to Python rows) at a time
+ARROW_BLOCK_SIZE = 1 << 20
+
+# A parsed CSV row: (row number, book column values, categories, moods)
+ImportRow = tuple[int, dict, list[str], list[str]]
+
+# Bytes of an upload inspected to choose its text encoding
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+# Concurrent enrich_book calls (Open Library / Groq) during import
+IMPORT_ENRICH_CONCURRENCY = 10
+# Seconds an import may spend enriching before the remaining books are
+# imported as-is (Open Library allows ~1 request per 3 s past its burst)
+IMPORT_ENRICH_DEADLINE = 60.0
+
+# MM/DD/YY or MM/DD/YYYY dates (e.g. Goodreads exports)
+_US_DATE_RE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{2,4})")
+
+
+def sniff_encoding(sample: bytes) -> str:
+    """Pick the encoding for an uploaded CSV from its first bytes."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # Incremental decode so a multi-byte character cut off at the end
+        # of the sample doesn't count as invalid
+        codecs.getincrementaldecoder("utf-8")().decode(sample)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
 
 def parse_date(value: str) -> Optional[date]:
-    """Parse date from various string formats."""
-    if not value or value.strip() == "":
+    """Parse date from various string formats (value already stripped)."""
+    if not value:
         return None
 
-    value = value.strip()
-
     # Try ISO format first (YYYY-MM-DD)
     try:
         return date.fromisoformat(value)
@@ -94,7 +141,7 @@ def parse_date(value: str) -> Optional[date]:
         pass
 
     # Try MM/DD/YY format
-    match = re.match(r"(\d{1,2})/(\d{1,2})/(\d{2,4})", value)
+    match = _US_DATE_RE.match(value)
     if match:
         month, day, year = match.groups()
         year = int(year)
@@ -109,11 +156,11 @@ def parse_date(value: str) -> Optional[date]:
 
 
 def parse_int(value: str) -> Optional[int]:
-    """Parse int from string, return None if invalid."""
-    if not value or value.strip() == "":
+    """Parse int from a stripped string, return None if invalid."""
+    if not value:
         return None
     try:
-        return int(float(value.strip()))
+        return int(float(value))
     except (ValueError, TypeError):
         return None
 
@@ -121,102 +168,150 @@ def parse_int(value: str) -> Optional[int]:
 def normalize_column_name(col: str) -> str:
     """Normalize column name to standard format."""
     col = col.strip().lower()
-    return COLUMN_MAPPINGS.get(col, COLUMN_MAPPINGS.get(col.title(), col))
+    return _COLUMN_MAPPINGS_CI.get(col, col)
+
 
+def build_column_index(header: list[str]) -> dict[str, tuple[int, ...]]:
+    """Map each standard field name to the positions of its columns in the header."""
+    columns: dict[str, list[int]] = {}
+    for position, col in enumerate(header):
+        columns.setdefault(normalize_column_name(col), []).append(position)
+    return {field: tuple(positions) for field, positions in columns.items()}
 
-def get_row_value(row: dict, field: str, mappings: dict = COLUMN_MAPPINGS) -> str:
-    """Get value from row, trying multiple possible column names."""
-    # Try direct field name
-    if field in row:
-        return row[field]
 
-    # Try to find a matching mapped column
-    for original, mapped in mappings.items():
-        if mapped == field and original in row:
-            return row[original]
+def row_value(row: list[str], columns: dict[str, tuple[int, ...]], field: str) -> str:
+    """
+    Get a standard field from a positional CSV row, stripped ("" if absent).
 
+    When several columns map to the field (e.g. ISBN and ISBN13), the first
+    non-blank one wins.
+    """
+    for position in columns.get(field, ()):
+        if position < len(row):
+            value = row[position].strip()
+            if value:
+                return value
     return ""
 
 
 def normalize_status(status: str) -> str:
-    """Normalize reading status to standard format."""
+    """Normalize a stripped reading status to standard format."""
     if not status:
         return "unread"
-    status = status.strip().lower()
-    return STATUS_MAPPINGS.get(status, "unread")
+    return STATUS_MAPPINGS.get(status.lower(), "unread")
 
 
 def normalize_format(fmt: str) -> str:
-    """Normalize book format to standard format."""
+    """Normalize a stripped book format to standard format."""
     if not fmt:
         return "kindle"
-    fmt = fmt.strip().lower()
-    return FORMAT_MAPPINGS.get(fmt, "kindle")
+    return FORMAT_MAPPINGS.get(fmt.lower(), "kindle")
 
 
-@router.post("/import/csv")
-async def import_csv(
-    file: UploadFile = File(...),
-    auto_categorize: bool = True,
-    enrich_metadata: bool = True,
-    session: Session = Depends(get_session),
-):
+def parse_csv(raw: BinaryIO) -> tuple[list[ImportRow], list[dict]]:
     """
-    Import books from a CSV file.
+    Parse an uploaded CSV into import rows plus per-row errors.
 
-    Supports multiple CSV formats including Goodreads exports.
+    The encoding is chosen from the first ENCODING_SNIFF_BYTES; if bytes
+    further on turn out not to fit it, the whole file is parsed again as
+    latin-1 (which decodes any byte) instead of rejecting the upload.
+    """
+    encoding = sniff_encoding(raw.read(ENCODING_SNIFF_BYTES))
+    try:
+        return parse_csv_as(raw, encoding)
+    except UnicodeDecodeError:
+        logger.info(f"CSV is not valid {encoding} past the sniffed sample, re-reading it as latin-1")
+        return parse_csv_as(raw, "latin-1")
 
-    Expected CSV columns (header row required):
-    - title (required)
-    - author (required)
-    - format (required: kindle, physical, audiobook, pdf, epub - or common variants)
-    - isbn/ISBN/ISBN13 (optional)
-    - description (optional)
-    - reading_status/Exclusive Shelf (optional: unread, reading, completed, dnf or Goodreads equivalents)
-    - purchase_date/Date Added (optional: YYYY-MM-DD or MM/DD/YY)
-    - date_started (optional: YYYY-MM-DD or MM/DD/YY)
-    - date_finished/Date Read (optional: YYYY-MM-DD or MM/DD/YY)
-    - rating/My Rating (optional: 1-5)
-    - notes (optional)
-    - cover_url (optional - will be fetched if missing and enrich_metadata=true)
-    - page_count/Number of Pages (optional - will be fetched if missing and enrich_metadata=true)
-    - categories/Bookshelves (optional: comma-separated - will be AI-generated if missing)
-    - moods (optional: comma-separated - will be AI-generated if missing)
+
+def parse_csv_as(raw: BinaryIO, encoding: str) -> tuple[list[ImportRow], list[dict]]:
     """
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="File must be a CSV")
+    Parse an uploaded CSV in the given encoding (UnicodeDecodeError if it doesn't fit).
 
-    content = await file.read()
+    Rows are streamed from the (spooled) upload file rather than decoding it
+    all in memory: by pyarrow's reader one block at a time when it is
+    installed and accepts the file, else by the csv module.
+    """
+    raw.seek(0)
 
-    # Try different encodings
-    for encoding in ["utf-8", "utf-8-sig", "latin-1"]:
+    # A UTF-8 BOM is dropped whatever the encoding, so a latin-1 re-read
+    # doesn't turn it into part of the first column name
+    header_line = raw.readline().removeprefix(codecs.BOM_UTF8)
+    # Handle tab-separated values
+    delimiter = "\t" if b"\t" in header_line else ","
+    # Header aliases are resolved to column positions once; rows stay lists
+    header = next(csv.reader(codecs.iterdecode([header_line], encoding), delimiter=delimiter), [])
+    columns = build_column_index(header)
+    # The BOM went with the header
+    if encoding == "utf-8-sig":
+        encoding = "utf-8"
+
+    body_start = raw.tell()
+    if pa is not None and header:
         try:
-            text = content.decode(encoding)
-            break
-        except UnicodeDecodeError:
-            continue
-    else:
-        raise HTTPException(status_code=400, detail="Could not decode CSV file")
+            rows = iter_csv_arrow(raw, encoding, delimiter, len(header))
+            return parse_rows(rows, columns)
+        except pa.ArrowInvalid:
+            # Ragged rows, invalid bytes, ...; may surface mid-file, so the
+            # csv module starts over
+            logger.info("pyarrow could not parse the CSV, falling back to the csv module")
+            raw.seek(body_start)
+
+    reader = csv.reader(codecs.iterdecode(raw, encoding), delimiter=delimiter)
+    return parse_rows(reader, columns)
+
+
+def iter_csv_arrow(
+    raw: BinaryIO,
+    encoding: str,
+    delimiter: str,
+    column_count: int,
+) -> Iterator[tuple[str, ...]]:
+    """
+    Yield the rows after the header with pyarrow, every value as text.
 
-    # Handle tab-separated values
-    if "\t" in text.split("\n")[0]:
-        reader = csv.DictReader(io.StringIO(text), delimiter="\t")
-    else:
-        reader = csv.DictReader(io.StringIO(text))
+    The file is read ARROW_BLOCK_SIZE bytes at a time, so only one block's
+    rows are held in Python at once. Raises pyarrow.ArrowInvalid for files
+    it can't parse.
+    """
+    # Positional names: headers may repeat, and aliases are resolved already
+    column_names = [f"c{i}" for i in range(column_count)]
+    raw.seek(0)
+    reader = pacsv.open_csv(
+        raw,
+        read_options=pacsv.ReadOptions(
+            block_size=ARROW_BLOCK_SIZE,
+            skip_rows=1,
+            column_names=column_names,
+            # Native UTF-8 decoding; anything else goes through Python's codec
+            encoding="utf8" if encoding == "utf-8" else encoding,
+        ),
+        parse_options=pacsv.ParseOptions(delimiter=delimiter, newlines_in_values=True),
+        # No type inference, and empty fields stay "" rather than null
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in column_names},
+            strings_can_be_null=False,
+        ),
+    )
+    for batch in reader:
+        yield from zip(*(column.to_pylist() for column in batch.columns))
 
-    imported = []
+
+def parse_rows(
+    reader: Iterable[list[str]],
+    columns: dict[str, tuple[int, ...]],
+) -> tuple[list[ImportRow], list[dict]]:
+    """Validate and normalize CSV rows (after the header) into import rows plus per-row errors."""
+    pending: list[ImportRow] = []
     errors = []
-    vector_store = VectorStore()
-    enrichment = BookEnrichmentService() if (auto_categorize or enrich_metadata) else None
 
-    for row_num, row in enumerate(reader, start=2):  # Start at 2 (header is row 1)
+    rows = (row for row in reader if row)  # Skip blank lines
+    for row_num, row in enumerate(rows, start=2):  # Start at 2 (header is row 1)
         try:
-            # Get values using flexible column mapping
-            title = (get_row_value(row, "title") or row.get("title", "")).strip()
-            author = (get_row_value(row, "author") or row.get("author", "")).strip()
-            book_format = normalize_format(
-                get_row_value(row, "format") or row.get("format", "")
-            )
+            # Get values using flexible column mapping (row_value strips them)
+            title = row_value(row, columns, "title")
+            author = row_value(row, columns, "author")
+            book_format = normalize_format(row_value(row, columns, "format"))
 
             if not title or not author:
                 errors.append(
@@ -228,34 +323,20 @@ async def import_csv(
                 continue
 
             # Get optional fields
-            isbn = get_row_value(row, "isbn") or row.get("ISBN", "") or row.get("ISBN13", "")
+            isbn = row_value(row, columns, "isbn")
             isbn = isbn.replace("=", "").replace('"', "").strip() or None
 
-            description = (get_row_value(row, "description") or "").strip() or None
+            description = row_value(row, columns, "description") or None
 
-            reading_status = normalize_status(
-                get_row_value(row, "reading_status") or
-                row.get("Exclusive Shelf", "") or
-                row.get("reading_status", "")
-            )
+            reading_status = normalize_status(row_value(row, columns, "reading_status"))
 
-            purchase_date = parse_date(
-                get_row_value(row, "purchase_date") or
-                row.get("Date Added", "") or
-                row.get("date_added", "")
-            )
+            purchase_date = parse_date(row_value(row, columns, "purchase_date"))
 
-            date_started = parse_date(get_row_value(row, "date_started"))
+            date_started = parse_date(row_value(row, columns, "date_started"))
 
-            date_finished = parse_date(
-                get_row_value(row, "date_finished") or
-                row.get("Date Read", "")
-            )
+            date_finished = parse_date(row_value(row, columns, "date_finished"))
 
-            rating = parse_int(
-                get_row_value(row, "rating") or
-                row.get("My Rating", "")
-            )
+            rating = parse_int(row_value(row, columns, "rating"))
             # Ensure rating is 1-5
             if rating is not None:
                 if rating == 0:
@@ -265,111 +346,226 @@ async def import_csv(
                 elif rating < 1:
                     rating = 1
 
-            notes = (get_row_value(row, "notes") or "").strip() or None
+            notes = row_value(row, columns, "notes") or None
 
-            cover_url = (get_row_value(row, "cover_url") or "").strip() or None
+            cover_url = row_value(row, columns, "cover_url") or None
 
-            page_count = parse_int(
-                get_row_value(row, "page_count") or
-                row.get("Number of Pages", "")
-            )
+            page_count = parse_int(row_value(row, columns, "page_count"))
 
             # Get categories and moods
-            categories_str = (
-                get_row_value(row, "categories") or
-                row.get("Bookshelves", "") or
-                ""
-            ).strip()
-            moods_str = (get_row_value(row, "moods") or "").strip()
+            categories_str = row_value(row, columns, "categories")
+            moods_str = row_value(row, columns, "moods")
 
             categories = (
-                [c.strip() for c in categories_str.split(",") if c.strip()]
+                [c for c in map(str.strip, categories_str.split(",")) if c]
                 if categories_str
                 else []
             )
             moods = (
-                [m.strip() for m in moods_str.split(",") if m.strip()]
+                [m for m in map(str.strip, moods_str.split(",")) if m]
                 if moods_str
                 else []
             )
 
-            # Enrich book data if enabled
-            if enrichment:
-                try:
-                    enriched = await enrichment.enrich_book(
-                        title=title,
-                        author=author,
-                        isbn=isbn,
-                        description=description,
-                        cover_url=cover_url,
-                        page_count=page_count,
-                        categories=categories,
-                        moods=moods,
-                        fetch_metadata=enrich_metadata and (not cover_url or not page_count),
-                        auto_categorize=auto_categorize and (not categories or not moods),
-                    )
-
-                    if enriched.get("cover_url"):
-                        cover_url = enriched["cover_url"]
-                    if enriched.get("page_count"):
-                        page_count = enriched["page_count"]
-                    if enriched.get("description") and not description:
-                        description = enriched["description"]
-                    if enriched.get("categories") and not categories:
-                        categories = enriched["categories"]
-                    if enriched.get("moods") and not moods:
-                        moods = enriched["moods"]
-                except Exception:
-                    logger.warning(f"Failed to enrich book '{title}' during import", exc_info=True)
-
-            # Create book
-            book = Book(
-                title=title,
-                author=author,
-                format=book_format,
-                isbn=isbn,
-                description=description,
-                reading_status=reading_status,
-                purchase_date=purchase_date,
-                date_started=date_started,
-                date_finished=date_finished,
-                rating=rating,
-                notes=notes,
-                cover_url=cover_url,
-                page_count=page_count,
-            )
-
-            session.add(book)
-            session.commit()
-            session.refresh(book)
+            pending.append((
+                row_num,
+                {
+                    "title": title,
+                    "author": author,
+                    "format": book_format,
+                    "isbn": isbn,
+                    "description": description,
+                    "reading_status": reading_status,
+                    "purchase_date": purchase_date,
+                    "date_started": date_started,
+                    "date_finished": date_finished,
+                    "rating": rating,
+                    "notes": notes,
+                    "cover_url": cover_url,
+                    "page_count": page_count,
+                },
+                categories,
+                moods,
+            ))
 
-            # Add categories
-            for cat in categories:
-                book_cat = BookCategory(book_id=book.id, category=cat)
-                session.add(book_cat)
+        except Exception as e:
+            errors.append({"row": row_num, "error": str(e)})
 
-            # Add moods
-            for mood in moods:
-                book_mood = BookMood(book_id=book.id, mood=mood)
-                session.add(book_mood)
+    return pending, errors
 
-            session.commit()
-            session.refresh(book)
 
-            # Generate and store embedding
-            try:
-                embedding = vector_store.add_book(book, categories, moods)
-                if embedding:
-                    book.embedding = embedding
-                    session.commit()
-            except Exception:
-                logger.warning(f"Failed to generate embedding for imported book {book.id}", exc_info=True)
+async def insert_books(
+    session: AsyncSession,
+    pending: list[ImportRow],
+    errors: list[dict],
+) -> dict[int, tuple[list[str], list[str]]]:
+    """
+    Insert parsed import rows and their tags in one transaction.
 
-            imported.append(book_to_read(book))
+    Books go in as a single multi-row INSERT ... RETURNING and the tags as one
+    executemany per table. If the batch is rejected (e.g. a value too long
+    for its column), it is retried row by row under savepoints so only the
+    offending rows are reported in errors. Returns the (categories, moods)
+    of each new book, keyed by its id.
+    """
+    try:
+        result = await session.exec(
+            insert(Book).returning(Book.id, sort_by_parameter_order=True),
+            params=[values for _, values, _, _ in pending],
+        )
+        book_ids = list(result.scalars())
 
+        category_rows = [
+            {"book_id": book_id, "category": category}
+            for book_id, (_, _, categories, _) in zip(book_ids, pending)
+            for category in categories
+        ]
+        mood_rows = [
+            {"book_id": book_id, "mood": mood}
+            for book_id, (_, _, _, moods) in zip(book_ids, pending)
+            for mood in moods
+        ]
+        if category_rows:
+            await session.exec(insert(BookCategory), params=category_rows)
+        if mood_rows:
+            await session.exec(insert(BookMood), params=mood_rows)
+
+        await session.commit()
+        return {
+            book_id: (categories, moods)
+            for book_id, (_, _, categories, moods) in zip(book_ids, pending)
+        }
+    except Exception:
+        await session.rollback()
+        logger.warning("Bulk import insert failed, retrying row by row", exc_info=True)
+
+    imported = {}
+    for row_num, values, categories, moods in pending:
+        try:
+            async with session.begin_nested():
+                result = await session.exec(insert(Book).values(**values).returning(Book.id))
+                book_id = result.scalar_one()
+                await insert_book_tags(session, book_id, categories, moods)
+            imported[book_id] = (categories, moods)
         except Exception as e:
             errors.append({"row": row_num, "error": str(e)})
 
+    await session.commit()
+    return imported
+
+
+@router.post("/import/csv")
+async def import_csv(
+    file: UploadFile = File(...),
+    auto_categorize: bool = True,
+    enrich_metadata: bool = True,
+    session: AsyncSession = Depends(get_async_session),
+    vector_store: VectorStore = Depends(get_vector_store),
+    enrichment: BookEnrichmentService = Depends(get_enrichment_service),
+):
+    """
+    Import books from a CSV file.
+
+    Supports multiple CSV formats including Goodreads exports.
+
+    Expected CSV columns (header row required):
+    - title (required)
+    - author (required)
+    - format (required: kindle, physical, audiobook, pdf, epub - or common variants)
+    - isbn/ISBN/ISBN13 (optional)
+    - description (optional)
+    - reading_status/Exclusive Shelf (optional: unread, reading, completed, dnf or Goodreads equivalents)
+    - purchase_date/Date Added (optional: YYYY-MM-DD or MM/DD/YY)
+    - date_started (optional: YYYY-MM-DD or MM/DD/YY)
+    - date_finished/Date Read (optional: YYYY-MM-DD or MM/DD/YY)
+    - rating/My Rating (optional: 1-5)
+    - notes (optional)
+    - cover_url (optional - will be fetched if missing and enrich_metadata=true)
+    - page_count/Number of Pages (optional - will be fetched if missing and enrich_metadata=true)
+    - categories/Bookshelves (optional: comma-separated - will be AI-generated if missing)
+    - moods (optional: comma-separated - will be AI-generated if missing)
+    """
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+
+    # Decoding and row parsing are CPU-bound; run them in a worker thread so
+    # the event loop keeps serving other requests during large imports
+    pending, errors = await asyncio.to_thread(parse_csv, file.file)
+    if not (auto_categorize or enrich_metadata):
+        enrichment = None
+
+    if enrichment and pending:
+        if enrich_metadata:
+            # Look the ISBNs up in batches first; the hits are cached, so the
+            # per-row lookups below only go to the network for the misses
+            isbns = [
+                values["isbn"]
+                for _, values, _, _ in pending
+                if values["isbn"] and (not values["cover_url"] or not values["page_count"])
+            ]
+            if isbns:
+                try:
+                    await enrichment.openlibrary.fetch_books_batch(isbns)
+                except Exception:
+                    logger.warning("Batch ISBN lookup failed during import", exc_info=True)
+
+        # Enrichment waits on Open Library / Groq, so enrich the rows
+        # concurrently (bounded to stay within their rate limits)
+        enriched_rows = await enrichment.enrich_books_bulk(
+            [
+                {
+                    "title": values["title"],
+                    "author": values["author"],
+                    "isbn": values["isbn"],
+                    "description": values["description"],
+                    "cover_url": values["cover_url"],
+                    "page_count": values["page_count"],
+                    "categories": categories,
+                    "moods": moods,
+                    "fetch_metadata": enrich_metadata and (not values["cover_url"] or not values["page_count"]),
+                    "auto_categorize": auto_categorize and (not categories or not moods),
+                }
+                for _, values, categories, moods in pending
+            ],
+            concurrency=IMPORT_ENRICH_CONCURRENCY,
+            deadline=IMPORT_ENRICH_DEADLINE,
+        )
+
+        for index, ((row_num, values, categories, moods), enriched) in enumerate(
+            zip(pending, enriched_rows)
+        ):
+            if enriched.get("cover_url"):
+                values["cover_url"] = enriched["cover_url"]
+            if enriched.get("page_count"):
+                values["page_count"] = enriched["page_count"]
+            if enriched.get("description") and not values["description"]:
+                values["description"] = enriched["description"]
+            if enriched.get("categories") and not categories:
+                categories = enriched["categories"]
+            if enriched.get("moods") and not moods:
+                moods = enriched["moods"]
+            pending[index] = (row_num, values, categories, moods)
+
+    imported_tags = await insert_books(session, pending, errors) if pending else {}
+
+    imported = []
+    if imported_tags:
+        # Embed all imported books together in batched forward passes rather
+        # than one encode call per row; encoding is CPU-bound, so keep it off
+        # the event loop
+        await asyncio.to_thread(vector_store.embed_books, list(imported_tags))
+
+        # Reload for the server-set timestamps; the tags were just inserted,
+        # so they aren't read back
+        result = await session.exec(
+            select(Book)
+            .where(Book.id.in_(list(imported_tags)))
+            .order_by(Book.id)
+            .execution_options(populate_existing=True)
+        )
+        imported = [book_to_read(book, *imported_tags[book.id]) for book in result.all()]
+        invalidate_library_caches()
+
     return {
         "imported_count": len(imported),
         "error_count": len(errors),
@@ -379,12 +575,26 @@ async def import_csv(
 
 
 @router.get("/export/csv")
-def export_csv(session: Session = Depends(get_session)):
+async def export_csv():
     """Export all books to a CSV file."""
-    books = session.exec(select(Book)).all()
+    return StreamingResponse(
+        export_rows(),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=library_export.csv"},
+    )
 
-    output = io.StringIO()
-    writer = csv.writer(output)
+
+async def export_rows():
+    """
+    Yield the export CSV a batch of books at a time.
+
+    Books are streamed from the database in batches of EXPORT_BATCH_SIZE
+    (with their tags) and written through one reusable buffer, so memory
+    stays flat regardless of library size. The generator runs after the
+    endpoint returns, so it opens its own session.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
 
     # Write header
     writer.writerow(
@@ -407,35 +617,44 @@ def export_csv(session: Session = Depends(get_session)):
         ]
     )
 
-    # Write books
-    for book in books:
-        categories = ",".join([c.category for c in book.categories])
-        moods = ",".join([m.mood for m in book.moods])
-
-        writer.writerow(
-            [
-                book.title,
-                book.author,
-                book.format,
-                book.isbn or "",
-                book.description or "",
-                book.reading_status,
-                book.purchase_date.isoformat() if book.purchase_date else "",
-                book.date_started.isoformat() if book.date_started else "",
-                book.date_finished.isoformat() if book.date_finished else "",
-                book.rating or "",
-                book.notes or "",
-                book.cover_url or "",
-                book.page_count or "",
-                categories,
-                moods,
-            ]
+    async with async_session_maker() as session:
+        result = await session.stream(
+            select(Book)
+            .options(selectinload(Book.categories), selectinload(Book.moods))
+            .order_by(Book.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
         )
 
-    output.seek(0)
+        # Write books
+        async for books in result.scalars().partitions():
+            for book in books:
+                categories = ",".join([c.category for c in book.categories])
+                moods = ",".join([m.mood for m in book.moods])
+
+                writer.writerow(
+                    [
+                        book.title,
+                        book.author,
+                        book.format,
+                        book.isbn or "",
+                        book.description or "",
+                        book.reading_status,
+                        book.purchase_date.isoformat() if book.purchase_date else "",
+                        book.date_started.isoformat() if book.date_started else "",
+                        book.date_finished.isoformat() if book.date_finished else "",
+                        book.rating or "",
+                        book.notes or "",
+                        book.cover_url or "",
+                        book.page_count or "",
+                        categories,
+                        moods,
+                    ]
+                )
 
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=library_export.csv"},
-    )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    # Header only (empty library)
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -1,9 +1,11 @@
 from typing import Optional
 
-from fastapi import APIRouter, Query
+import orjson
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from ..services.rag_service import RAGService
+from ..services.rag_service import NO_RESULTS_RESPONSE, RAGService, get_rag_service
 
 router = APIRouter(prefix="/api/search", tags=["search"])
 
@@ -34,7 +36,10 @@ class SearchResponse(BaseModel):
 
 
 @router.post("/query", response_model=SearchResponse)
-async def search_books(search: SearchQuery):
+async def search_books(
+    search: SearchQuery,
+    rag_service: RAGService = Depends(get_rag_service),
+):
     """
     Perform RAG-powered natural language search.
 
@@ -43,7 +48,6 @@ async def search_books(search: SearchQuery):
     - "inspiring books about space exploration"
     - "something thrilling I haven't read yet"
     """
-    rag_service = RAGService()
     result = await rag_service.search(
         query=search.query,
         n_results=search.n_results,
@@ -69,3 +73,46 @@ async def search_books(search: SearchQuery):
     ]
 
     return SearchResponse(response=result["response"], books=books)
+
+
+def sse_event(data, event: Optional[str] = None) -> bytes:
+    """Encode one server-sent event with a JSON payload."""
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+@router.post("/stream")
+async def stream_search(
+    search: SearchQuery,
+    rag_service: RAGService = Depends(get_rag_service),
+):
+    """
+    RAG search as server-sent events, so the answer renders as it is generated.
+
+    Emits one "books" event with the matched books (same shape as /query),
+    then unnamed events carrying {"text": ...} chunks of the response, then
+    a "done" event.
+    """
+    books = await rag_service.retrieve(
+        query=search.query,
+        n_results=search.n_results,
+        category=search.category,
+        mood=search.mood,
+        format=search.format,
+        reading_status=search.reading_status,
+    )
+
+    async def events():
+        yield sse_event(books, event="books")
+        if not books:
+            yield sse_event({"text": NO_RESULTS_RESPONSE})
+        else:
+            async for chunk in rag_service.stream_response(search.query, books):
+                yield sse_event({"text": chunk})
+        yield sse_event({}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
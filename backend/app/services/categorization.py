@@ -1,27 +1,53 @@
-import json
+import asyncio
 import logging
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Optional
 
-from groq import Groq
+import httpx
+import numpy as np
+import orjson
+from groq import AsyncGroq
 
 from ..config import get_settings
+from .embedding_service import get_embedding_service
 
 logger = logging.getLogger(__name__)
 
 
 class CategorizationService:
-    """Service for auto-categorizing books using Groq LLM."""
+    """Service for auto-categorizing books (local zero-shot match, falling back to Groq LLM)."""
 
     MODEL = "llama-3.1-8b-instant"
-
-    def __init__(self):
+    # Suggestions kept in memory per (title, author, description), LRU-evicted
+    CACHE_SIZE = 10_000
+    # Minimum cosine similarity for a zero-shot category/mood match; much
+    # lower and nearly every book with a description matches something, so
+    # uncertain books never reach the LLM
+    ZERO_SHOT_THRESHOLD = 0.4
+    # Labels after the best one are kept only when they score this close to
+    # it, so a clear winner isn't padded with weaker, unrelated labels
+    ZERO_SHOT_MARGIN = 0.05
+    # Categories a book can have at most one of
+    EXCLUSIVE_CATEGORIES = frozenset({"fiction", "non-fiction"})
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         settings = get_settings()
         api_key = settings.GROQ_API_KEY
         if not api_key:
             logger.warning("GROQ_API_KEY is not set - categorization will not work")
-        self.client = Groq(api_key=api_key) if api_key else None
+        # Pooled keep-alive connections to Groq, reused across calls (batch
+        # recategorization issues many concurrent requests)
+        self.http_client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=16, keepalive_expiry=30),
+        )
+        self.client = (
+            AsyncGroq(api_key=api_key, http_client=self.http_client) if api_key else None
+        )
         self.valid_categories = settings.CATEGORIES
         self.valid_moods = settings.MOODS
+        self.disable_embeddings = settings.DISABLE_EMBEDDINGS
+        self._cache: OrderedDict[tuple[str, str, str], dict] = OrderedDict()
 
     async def categorize_book(
         self,
@@ -34,6 +60,27 @@ class CategorizationService:
 
         Returns dict with 'categories' and 'moods' lists.
         """
+        # Same book seen before (re-imports, batch recategorization)
+        cache_key = (title.strip().lower(), author.strip().lower(), description or "")
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            return {"categories": list(cached["categories"]), "moods": list(cached["moods"])}
+
+        # Try a local zero-shot match on the embedding model first; encoding is
+        # CPU-bound, so keep it off the event loop
+        try:
+            local = await asyncio.to_thread(self._categorize_locally, title, author, description)
+        except Exception:
+            logger.warning(f"Local categorization failed for '{title}'", exc_info=True)
+            local = None
+        if local:
+            logger.info(f"Local categorization result: {local}")
+            self._remember(
+                cache_key, {"categories": list(local["categories"]), "moods": list(local["moods"])}
+            )
+            return local
+
         system_prompt = f"""You are a book categorization assistant with extensive knowledge of books and authors. Given a book's title, author, and optional description, suggest appropriate categories and moods.
 
 Available categories: {', '.join(self.valid_categories)}
@@ -74,7 +121,7 @@ Categorize this book."""
 
         try:
             logger.info(f"Categorizing book: {title} by {author}")
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -95,7 +142,7 @@ Categorize this book."""
                     content = content[4:]
                 content = content.strip()
 
-            result = json.loads(content)
+            result = orjson.loads(content)
 
             # Validate categories and moods
             categories = [
@@ -104,6 +151,9 @@ Categorize this book."""
             moods = [m for m in result.get("moods", []) if m in self.valid_moods]
 
             logger.info(f"Categorization result: categories={categories}, moods={moods}")
+            if categories or moods:
+                # Cache copies; callers may mutate the returned lists
+                self._remember(cache_key, {"categories": categories[:3], "moods": moods[:3]})
             return {
                 "categories": categories[:3],  # Max 3
                 "moods": moods[:3],  # Max 3
@@ -113,3 +163,83 @@ Categorize this book."""
             logger.error(f"Categorization failed for '{title}': {e}", exc_info=True)
             # Return empty suggestions on error
             return {"categories": [], "moods": []}
+
+    def _categorize_locally(
+        self, title: str, author: str, description: Optional[str]
+    ) -> Optional[dict]:
+        """
+        Zero-shot categorize a book by comparing its embedding with embeddings
+        of each category/mood (and its related keywords).
+
+        Returns None, so the LLM is used instead, when there is too little to
+        go on: no description, embeddings disabled, or no category or no mood
+        scoring above ZERO_SHOT_THRESHOLD.
+        """
+        if not description or self.disable_embeddings:
+            return None
+
+        embedding_service = get_embedding_service()
+        book_vec = embedding_service.embed_text(
+            embedding_service.create_book_text(title=title, author=author, description=description)
+        )
+        categories = self._top_labels(
+            book_vec,
+            self.valid_categories,
+            embedding_service.category_prototypes(tuple(self.valid_categories)),
+            exclusive=self.EXCLUSIVE_CATEGORIES,
+        )
+        moods = self._top_labels(
+            book_vec,
+            self.valid_moods,
+            embedding_service.mood_prototypes(tuple(self.valid_moods)),
+        )
+        if not categories or not moods:
+            return None
+        return {"categories": categories, "moods": moods}
+
+    def _top_labels(
+        self,
+        book_vec: np.ndarray,
+        labels,
+        prototypes: np.ndarray,
+        exclusive: frozenset[str] = frozenset(),
+    ) -> list[str]:
+        """
+        Up to 3 labels whose prototype is most similar to the book.
+
+        Each must score at least ZERO_SHOT_THRESHOLD and be within
+        ZERO_SHOT_MARGIN of the best label; only the best-scoring of the
+        `exclusive` labels is kept.
+        """
+        scores = prototypes @ book_vec
+        ranked = np.argsort(-scores)
+        cutoff = max(self.ZERO_SHOT_THRESHOLD, scores[ranked[0]] - self.ZERO_SHOT_MARGIN)
+
+        chosen: list[str] = []
+        for i in ranked:
+            if scores[i] < cutoff or len(chosen) == 3:
+                break
+            label = labels[i]
+            if label in exclusive and any(other in exclusive for other in chosen):
+                continue
+            chosen.append(label)
+        return chosen
+
+    def _remember(self, key: tuple[str, str, str], suggestions: dict) -> None:
+        """Cache suggestions for a book, evicting the least recently used entry when full."""
+        self._cache[key] = suggestions
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+
+@lru_cache
+def get_categorization_service() -> CategorizationService:
+    return CategorizationService()
+
+
+async def close_categorization_service() -> None:
+    """Close the cached service's HTTP client on shutdown."""
+    if get_categorization_service.cache_info().currsize:
+        await get_categorization_service().http_client.aclose()
+        get_categorization_service.cache_clear()
@@ -2,27 +2,35 @@
 Service for enriching book data with cover URLs, page counts, and metadata.
 Uses Open Library API to search by title and author when ISBN is not available.
 """
+import asyncio
+import logging
+from functools import lru_cache
 from typing import Optional
 
-import httpx
+import orjson
 
-from .openlibrary import OpenLibraryService
-from .categorization import CategorizationService
+from .openlibrary import COVER_URL, LookupUnavailable, OpenLibraryService, get_openlibrary_service
+from .ttl_cache import MISSING, TTLCache
+from .categorization import get_categorization_service
+
+logger = logging.getLogger(__name__)
 
 
 class BookEnrichmentService:
     """Service for enriching book data with metadata from external sources."""
 
-    def __init__(self):
-        self.openlibrary = OpenLibraryService()
-        self._categorization: Optional[CategorizationService] = None
+    # Title/author searches kept in memory, LRU-evicted (hits for a week,
+    # no-match results for an hour)
+    SEARCH_CACHE_SIZE = 8192
+    SEARCH_CACHE_TTL = 7 * 24 * 60 * 60
+    SEARCH_MISS_TTL = 60 * 60
+    # Only the search.json fields read from each doc
+    SEARCH_FIELDS = "title,author_name,cover_i,number_of_pages_median,first_sentence"
 
-    @property
-    def categorization(self) -> CategorizationService:
-        """Lazy load categorization service."""
-        if self._categorization is None:
-            self._categorization = CategorizationService()
-        return self._categorization
+    def __init__(self):
+        self.openlibrary = get_openlibrary_service()
+        self.categorization = get_categorization_service()
+        self._search_cache = TTLCache(self.SEARCH_CACHE_SIZE, self.SEARCH_CACHE_TTL)
 
     async def enrich_book(
         self,
@@ -55,10 +63,16 @@ class BookEnrichmentService:
         Returns:
             Dict with enriched book data (only includes fields that were enriched)
         """
+        needs_metadata = fetch_metadata and (not cover_url or not page_count)
+        needs_categories = auto_categorize and (not categories or not moods)
+        if not (needs_metadata or needs_categories):
+            # Already complete: skip the lookups entirely
+            return {}
+
         enriched = {}
 
         # Try to fetch metadata if we're missing cover_url or page_count
-        if fetch_metadata and (not cover_url or not page_count):
+        if needs_metadata:
             metadata = await self._fetch_metadata(title, author, isbn)
             if metadata:
                 if not cover_url and metadata.get("cover_url"):
@@ -69,7 +83,7 @@ class BookEnrichmentService:
                     enriched["description"] = metadata["description"]
 
         # Auto-categorize if no categories or moods
-        if auto_categorize and (not categories or not moods):
+        if needs_categories:
             try:
                 suggestions = await self.categorization.categorize_book(
                     title, author, description or enriched.get("description", "")
@@ -83,16 +97,67 @@ class BookEnrichmentService:
 
         return enriched
 
+    async def enrich_books_bulk(
+        self,
+        books: list[dict],
+        concurrency: int = 16,
+        deadline: Optional[float] = None,
+    ) -> list[dict]:
+        """
+        Enrich many books concurrently; each item holds enrich_book's arguments.
+
+        At most `concurrency` books are in flight. Each metadata request is
+        bounded by http_client.REQUEST_DEADLINE once it has its rate limiter token, so a
+        large import waits its turn at the limiter instead of timing out.
+        `deadline` caps the whole batch in seconds: books still queued or in
+        flight when it runs out are skipped, since past the limiter's burst
+        every further lookup waits for a token.
+        Returns the enriched fields in input order; a book that fails or is
+        skipped gets {}.
+        """
+        results: list[dict] = [{} for _ in books]
+        finished = 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def enrich_one(index: int, book: dict) -> None:
+            nonlocal finished
+            async with semaphore:
+                try:
+                    results[index] = await self.enrich_book(**book)
+                except Exception:
+                    logger.warning(f"Failed to enrich book '{book['title']}'", exc_info=True)
+            finished += 1
+
+        try:
+            async with asyncio.timeout(deadline):
+                async with asyncio.TaskGroup() as group:
+                    for index, book in enumerate(books):
+                        group.create_task(enrich_one(index, book))
+        except TimeoutError:
+            logger.warning(
+                f"Enrichment took longer than {deadline}s; "
+                f"skipped {len(books) - finished} of {len(books)} books"
+            )
+
+        return results
+
     async def _fetch_metadata(
         self,
         title: str,
         author: str,
         isbn: Optional[str] = None,
     ) -> Optional[dict]:
-        """Fetch book metadata from Open Library."""
-        # First try by ISBN if available
+        """
+        Fetch book metadata from Open Library.
+
+        An ISBN match is preferred; the title/author search only runs when
+        there's no ISBN or it isn't found, so a hit costs a single request.
+        """
         if isbn:
-            result = await self.openlibrary.fetch_book_metadata(isbn)
+            try:
+                result = await self.openlibrary.fetch_book_metadata(isbn)
+            except Exception:
+                result = None
             if result:
                 return {
                     "cover_url": result.cover_url,
@@ -100,67 +165,88 @@ class BookEnrichmentService:
                     "description": result.description,
                 }
 
-        # Otherwise search by title and author
+        return await self._search_metadata(title, author)
+
+    async def _search_metadata(self, title: str, author: str) -> Optional[dict]:
+        """Best title/author match from Open Library, if any (cached per title/author)."""
+        cache_key = self._search_key(title, author)
+        cached = self._search_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+
         try:
             results = await self._search_openlibrary(title, author)
-            if results:
-                return results[0]
         except Exception:
-            pass
+            # API trouble: serve the last known result, even if expired
+            stale = self._search_cache.get_stale(cache_key)
+            return None if stale is MISSING else stale
 
-        return None
+        result = results[0] if results else None
+        self._search_cache.set(cache_key, result, ttl=None if result else self.SEARCH_MISS_TTL)
+        return result
 
     async def _search_openlibrary(
         self,
         title: str,
         author: str,
     ) -> list[dict]:
-        """Search Open Library by title and author."""
-        # Clean up the title (remove series info in parentheses)
-        clean_title = title.split("(")[0].strip()
-
-        # Clean up author (remove prefixes like "by")
-        clean_author = author.replace("by ", "").strip()
+        """Search Open Library by title and author; raises LookupUnavailable on an error response."""
+        clean_title, clean_author = self._search_key(title, author)
 
         # Build search query
         query = f"{clean_title} {clean_author}"
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            url = f"https://openlibrary.org/search.json?q={query}&limit=3"
-            response = await client.get(url)
-
-            if response.status_code != 200:
-                return []
-
-            data = response.json()
-            results = []
+        url = f"{self.openlibrary.BASE_URL}/search.json"
+        response = await self.openlibrary.get(
+            url,
+            params={"q": query, "limit": 3, "fields": self.SEARCH_FIELDS},
+            timeout=10.0,
+        )
+
+        if response.status_code != 200:
+            raise LookupUnavailable(url)
+
+        data = orjson.loads(response.content)
+        results = []
+        title_lower = clean_title.lower()
+        author_lower = clean_author.lower()
+
+        for doc in data.get("docs", []):
+            # Basic relevance check: title or any author overlaps (the
+            # authors are only compared when the title doesn't)
+            doc_title = doc.get("title", "").lower()
+            title_match = title_lower in doc_title or doc_title in title_lower
+            if not title_match and not any(
+                author_lower in doc_author or doc_author in author_lower
+                for doc_author in map(str.lower, doc.get("author_name", ()))
+            ):
+                continue
+
+            result = {
+                "title": doc.get("title"),
+                "author": ", ".join(doc.get("author_name", [])),
+                "cover_url": COVER_URL(cover_id, "L") if (cover_id := doc.get("cover_i")) else None,
+                "page_count": doc.get("number_of_pages_median"),
+                "description": doc.get("first_sentence", [None])[0]
+                if doc.get("first_sentence")
+                else None,
+            }
+            results.append(result)
+
+        return results
+
+    @staticmethod
+    def _search_key(title: str, author: str) -> tuple[str, str]:
+        """Title without series info in parentheses, author without a "by" prefix."""
+        # Clean up the title (remove series info in parentheses)
+        clean_title = title.split("(")[0].strip()
 
-            for doc in data.get("docs", []):
-                # Check if this is a reasonable match
-                doc_title = doc.get("title", "").lower()
-                doc_authors = [a.lower() for a in doc.get("author_name", [])]
+        # Clean up author (remove prefixes like "by")
+        clean_author = author.replace("by ", "").strip()
 
-                # Basic relevance check
-                title_match = clean_title.lower() in doc_title or doc_title in clean_title.lower()
-                author_match = any(
-                    clean_author.lower() in a or a in clean_author.lower()
-                    for a in doc_authors
-                )
+        return clean_title, clean_author
 
-                if not (title_match or author_match):
-                    continue
-
-                result = {
-                    "title": doc.get("title"),
-                    "author": ", ".join(doc.get("author_name", [])),
-                    "cover_url": f"https://covers.openlibrary.org/b/id/{doc['cover_i']}-L.jpg"
-                    if doc.get("cover_i")
-                    else None,
-                    "page_count": doc.get("number_of_pages_median"),
-                    "description": doc.get("first_sentence", [None])[0]
-                    if doc.get("first_sentence")
-                    else None,
-                }
-                results.append(result)
 
-            return results
+@lru_cache
+def get_enrichment_service() -> BookEnrichmentService:
+    return BookEnrichmentService()
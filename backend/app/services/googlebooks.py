@@ -4,66 +4,81 @@ import os
 from typing import Optional
 
 import httpx
+import orjson
 
 from ..models.book import BookLookupResult
+from .http_client import AsyncRateLimiter, get_http_client, limited_get
+from .openlibrary import LookupUnavailable, clean_isbn
 
 
 class GoogleBooksService:
     """Service for fetching book metadata from Google Books API."""
 
     BASE_URL = "https://www.googleapis.com/books/v1"
+    # Default Books API quota is 1,000 calls a day; shared by every instance
+    # (one is created per fallback lookup)
+    limiter = AsyncRateLimiter(1000, 86400.0)
 
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.api_key = os.getenv("GOOGLE_BOOKS_API_KEY")
+        self._client = client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The injected client, or the shared one (resolved per call so it survives a restart)."""
+        return self._client or get_http_client()
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET a Books API URL, waiting for the rate limiter first."""
+        return await limited_get(self.client, self.limiter, url, **kwargs)
 
     async def fetch_book_metadata(self, isbn: str) -> Optional[BookLookupResult]:
-        """Fetch book metadata from Google Books by ISBN."""
-        isbn = isbn.replace("-", "").replace(" ", "")
+        """Fetch book metadata from Google Books by ISBN; raises LookupUnavailable on an error response."""
+        isbn = clean_isbn(isbn)
 
         params = {"q": f"isbn:{isbn}"}
         if self.api_key:
             params["key"] = self.api_key
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            url = f"{self.BASE_URL}/volumes"
-            response = await client.get(url, params=params)
+        url = f"{self.BASE_URL}/volumes"
+        response = await self.get(url, params=params, timeout=10.0)
 
-            if response.status_code != 200:
-                return None
+        if response.status_code != 200:
+            raise LookupUnavailable(url)
 
-            data = response.json()
+        data = orjson.loads(response.content)
 
-            if data.get("totalItems", 0) == 0:
-                return None
+        if data.get("totalItems", 0) == 0:
+            return None
 
-            items = data.get("items", [])
-            if not items:
-                return None
+        items = data.get("items", [])
+        if not items:
+            return None
 
-            volume = items[0].get("volumeInfo", {})
+        volume = items[0].get("volumeInfo", {})
 
-            # Extract cover URL (prefer larger images)
-            cover_url = None
-            image_links = volume.get("imageLinks", {})
-            for size in ["large", "medium", "small", "thumbnail"]:
-                if size in image_links:
-                    cover_url = image_links[size]
-                    # Google returns http URLs, upgrade to https
-                    if cover_url.startswith("http://"):
-                        cover_url = cover_url.replace("http://", "https://")
-                    break
+        # Extract cover URL (prefer larger images)
+        cover_url = None
+        image_links = volume.get("imageLinks", {})
+        for size in ["large", "medium", "small", "thumbnail"]:
+            if size in image_links:
+                cover_url = image_links[size]
+                # Google returns http URLs, upgrade to https
+                if cover_url.startswith("http://"):
+                    cover_url = cover_url.replace("http://", "https://")
+                break
 
-            # Extract description
-            description = volume.get("description")
+        # Extract description
+        description = volume.get("description")
 
-            return BookLookupResult(
-                title=volume.get("title", "Unknown"),
-                author=", ".join(volume.get("authors", ["Unknown"])),
-                description=description,
-                cover_url=cover_url,
-                page_count=volume.get("pageCount"),
-                isbn=isbn,
-            )
+        return BookLookupResult.model_construct(
+            title=volume.get("title", "Unknown"),
+            author=", ".join(volume.get("authors", ["Unknown"])),
+            description=description,
+            cover_url=cover_url,
+            page_count=volume.get("pageCount"),
+            isbn=isbn,
+        )
 
     async def search_books(self, query: str, limit: int = 10) -> list[dict]:
         """Search for books by title/author."""
@@ -71,43 +86,43 @@ class GoogleBooksService:
         if self.api_key:
             params["key"] = self.api_key
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            url = f"{self.BASE_URL}/volumes"
-            response = await client.get(url, params=params)
-
-            if response.status_code != 200:
-                return []
-
-            data = response.json()
-            results = []
-
-            for item in data.get("items", []):
-                volume = item.get("volumeInfo", {})
-
-                # Get ISBN
-                isbn = None
-                for identifier in volume.get("industryIdentifiers", []):
-                    if identifier.get("type") in ["ISBN_13", "ISBN_10"]:
-                        isbn = identifier.get("identifier")
-                        break
-
-                # Get cover
-                cover_url = None
-                image_links = volume.get("imageLinks", {})
-                if "thumbnail" in image_links:
-                    cover_url = image_links["thumbnail"]
-                    if cover_url.startswith("http://"):
-                        cover_url = cover_url.replace("http://", "https://")
-
-                result = {
-                    "title": volume.get("title", "Unknown"),
-                    "author": ", ".join(volume.get("authors", ["Unknown"])),
-                    "isbn": isbn,
-                    "cover_url": cover_url,
-                    "first_publish_year": volume.get("publishedDate", "")[:4]
-                    if volume.get("publishedDate")
-                    else None,
-                }
-                results.append(result)
-
-            return results
+        url = f"{self.BASE_URL}/volumes"
+        response = await self.get(url, params=params, timeout=10.0)
+
+        if response.status_code != 200:
+            return []
+
+        data = orjson.loads(response.content)
+        results = []
+
+        for item in data.get("items", []):
+            volume = item.get("volumeInfo", {})
+
+            # Get ISBN
+            isbn = None
+            for identifier in volume.get("industryIdentifiers", []):
+                if identifier.get("type") in ["ISBN_13", "ISBN_10"]:
+                    isbn = identifier.get("identifier")
+                    break
+
+            # Get cover
+            cover_url = None
+            image_links = volume.get("imageLinks", {})
+            if "thumbnail" in image_links:
+                cover_url = image_links["thumbnail"]
+                if cover_url.startswith("http://"):
+                    cover_url = cover_url.replace("http://", "https://")
+
+            result = {
+                "title": volume.get("title", "Unknown"),
+                "author": ", ".join(volume.get("authors", ["Unknown"])),
+                "isbn": isbn,
+                "cover_url": cover_url,
+                "first_publish_year": volume.get("publishedDate", "")[:4]
+                if volume.get("publishedDate")
+                else None,
+            }
+            results.append(result)
+
+        return results
+
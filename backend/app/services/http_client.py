@@ -0,0 +1,106 @@
+"""Shared HTTP client for outbound calls to book metadata APIs."""
+import asyncio
+import time
+from functools import lru_cache
+
+import httpx
+
+# Open Library asks API clients to identify themselves
+USER_AGENT = "personal-library/1.0"
+# Longest one metadata API request may take in total, counted once it has
+# its rate limiter token (the client timeout only bounds each read/connect)
+REQUEST_DEADLINE = 8.0
+
+
+@lru_cache
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Process-wide AsyncClient so lookups reuse pooled keep-alive connections.
+
+    HTTP/2 lets concurrent lookups (e.g. during a CSV import) share one TLS
+    connection per host instead of opening one each. httpx advertises every
+    decoder it has in Accept-Encoding, so with brotli installed (the
+    httpx[brotli] extra) JSON responses arrive br-compressed, else gzip.
+    """
+    return httpx.AsyncClient(
+        timeout=15.0,
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+async def close_http_client() -> None:
+    """Close the shared client on shutdown."""
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+        get_http_client.cache_clear()
+
+
+async def limited_get(
+    client: httpx.AsyncClient, limiter: "AsyncRateLimiter", url: str, **kwargs
+) -> httpx.Response:
+    """
+    GET url once the limiter grants a token.
+
+    Only the request itself counts against REQUEST_DEADLINE, so a long wait
+    for a token can't time it out; past the deadline it fails like any other
+    httpx timeout.
+    """
+    async with limiter:
+        try:
+            async with asyncio.timeout(REQUEST_DEADLINE):
+                return await client.get(url, **kwargs)
+        except TimeoutError as e:
+            raise httpx.TimeoutException(f"No response within {REQUEST_DEADLINE}s: {url}") from e
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket for calls to an external API: bursts of up to `rate` calls,
+    refilled at `rate` per `per` seconds. Callers over the limit wait their
+    turn (in arrival order) instead of being rejected by the API.
+    """
+
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._waiting = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.per)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Take a token, sleeping until one is available."""
+        self._waiting += 1
+        try:
+            # The lock queues callers fairly while the head waits for a refill
+            async with self._lock:
+                self._refill()
+                if self._tokens < 1:
+                    await asyncio.sleep((1 - self._tokens) * self.per / self.rate)
+                    self._refill()
+                self._tokens -= 1
+        finally:
+            self._waiting -= 1
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    def stats(self) -> dict:
+        """Current state, for the metrics endpoint."""
+        self._refill()
+        return {
+            "rate": self.rate,
+            "per_seconds": self.per,
+            "available": int(self._tokens),
+            "waiting": self._waiting,
+        }
@@ -0,0 +1,14 @@
+"""Counter of library writes in this process, used to key caches of derived results."""
+
+_version = 0
+
+
+def library_version() -> int:
+    """Current version; changes whenever books, their tags or embeddings change."""
+    return _version
+
+
+def bump_library_version() -> None:
+    """Record a write so cached results keyed on the old version are no longer used."""
+    global _version
+    _version += 1
@@ -1,8 +1,27 @@
+from functools import lru_cache
 from typing import Optional
 
 import httpx
+import orjson
 
 from ..models.book import BookLookupResult
+from .http_client import AsyncRateLimiter, get_http_client, limited_get
+from .ttl_cache import MISSING, TTLCache
+
+# Open Library cover image URL for a cover id and size (S, M or L)
+COVER_URL = "https://covers.openlibrary.org/b/id/{}-{}.jpg".format
+
+# Deletes the separators people type into ISBNs, in one pass
+_ISBN_STRIP = str.maketrans("", "", "- ")
+
+
+def clean_isbn(isbn: str) -> str:
+    """Canonical form of an ISBN: no dashes or spaces, uppercase X check digit."""
+    return isbn.translate(_ISBN_STRIP).upper()
+
+
+class LookupUnavailable(Exception):
+    """The metadata API didn't answer (error status); the result is unknown, not a miss."""
 
 
 class OpenLibraryService:
@@ -12,119 +31,220 @@ class OpenLibraryService:
     """
 
     BASE_URL = "https://openlibrary.org"
+    # search.json returns every field of each doc unless told otherwise;
+    # request only the ones read below
+    ISBN_SEARCH_FIELDS = "title,author_name,first_sentence,cover_i,number_of_pages_median"
+    SEARCH_FIELDS = "title,author_name,isbn,cover_i,first_publish_year,first_sentence"
+    # ISBN lookups kept in memory, LRU-evicted; metadata rarely changes, so
+    # hits are kept for a week and misses for an hour
+    ISBN_CACHE_SIZE = 8192
+    ISBN_CACHE_TTL = 7 * 24 * 60 * 60
+    ISBN_MISS_TTL = 60 * 60
+    # ISBNs per books API request in fetch_books_batch (keeps the URL short)
+    BATCH_SIZE = 50
+    # Open Library allows 100 calls per 5 minutes per IP; shared by every
+    # instance since the limit is per process, not per client
+    limiter = AsyncRateLimiter(100, 300.0)
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self._client = client
+        self._isbn_cache = TTLCache(self.ISBN_CACHE_SIZE, self.ISBN_CACHE_TTL)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The injected client, or the shared one (resolved per call so it survives a restart)."""
+        return self._client or get_http_client()
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET an Open Library URL, waiting for the rate limiter first."""
+        return await limited_get(self.client, self.limiter, url, **kwargs)
 
     async def fetch_book_metadata(self, isbn: str, use_fallback: bool = True) -> Optional[BookLookupResult]:
-        """Fetch book metadata from Open Library by ISBN."""
-        # Clean up ISBN
-        isbn = isbn.replace("-", "").replace(" ", "")
+        """Fetch book metadata from Open Library by ISBN (cached per ISBN)."""
+        isbn = clean_isbn(isbn)
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            # Try the books API first
-            url = f"{self.BASE_URL}/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
-            response = await client.get(url)
+        cache_key = (isbn, use_fallback)
+        cached = self._isbn_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
 
-            if response.status_code != 200:
+        try:
+            result = await self._fetch_book_metadata(isbn, use_fallback)
+        except (LookupUnavailable, httpx.HTTPError) as e:
+            # API trouble: serve the last known result, even if expired
+            stale = self._isbn_cache.get_stale(cache_key)
+            if stale is not MISSING:
+                return stale
+            if isinstance(e, LookupUnavailable):
+                return None
+            raise
+        self._isbn_cache.set(cache_key, result, ttl=None if result else self.ISBN_MISS_TTL)
+        return result
+
+    def invalidate(self, isbn: str) -> None:
+        """Forget cached lookups for an ISBN so the next one hits the API."""
+        isbn = clean_isbn(isbn)
+        for use_fallback in (True, False):
+            self._isbn_cache.invalidate((isbn, use_fallback))
+
+    async def _fetch_book_metadata(self, isbn: str, use_fallback: bool) -> Optional[BookLookupResult]:
+        """Uncached ISBN lookup; raises LookupUnavailable on an error response."""
+        url = f"{self.BASE_URL}/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
+        response = await self.get(url)
+
+        if response.status_code != 200:
+            raise LookupUnavailable(url)
+
+        data = orjson.loads(response.content)
+        key = f"ISBN:{isbn}"
+
+        if key not in data:
+            # Try searching by ISBN
+            search_url = f"{self.BASE_URL}/search.json"
+            search_response = await self.get(
+                search_url, params={"isbn": isbn, "fields": self.ISBN_SEARCH_FIELDS}
+            )
+
+            if search_response.status_code != 200:
+                raise LookupUnavailable(search_url)
+
+            search_data = orjson.loads(search_response.content)
+            if not search_data.get("docs"):
+                # Not found in Open Library, try Google Books as fallback
+                if use_fallback:
+                    return await self._fallback_to_google_books(isbn)
                 return None
 
-            data = response.json()
-            key = f"ISBN:{isbn}"
-
-            if key not in data:
-                # Try searching by ISBN
-                search_url = f"{self.BASE_URL}/search.json?isbn={isbn}"
-                search_response = await client.get(search_url)
-
-                if search_response.status_code != 200:
-                    return None
-
-                search_data = search_response.json()
-                if not search_data.get("docs"):
-                    # Not found in Open Library, try Google Books as fallback
-                    if use_fallback:
-                        return await self._fallback_to_google_books(isbn)
-                    return None
-
-                doc = search_data["docs"][0]
-                return BookLookupResult(
-                    title=doc.get("title", "Unknown"),
-                    author=", ".join(doc.get("author_name", ["Unknown"])),
-                    description=doc.get("first_sentence", [None])[0]
-                    if doc.get("first_sentence")
-                    else None,
-                    cover_url=f"https://covers.openlibrary.org/b/id/{doc['cover_i']}-L.jpg"
-                    if doc.get("cover_i")
-                    else None,
-                    page_count=doc.get("number_of_pages_median"),
-                    isbn=isbn,
-                )
-
-            book_data = data[key]
-
-            # Extract authors
-            authors = book_data.get("authors", [])
-            author_names = [a.get("name", "") for a in authors]
-            author = ", ".join(author_names) if author_names else "Unknown"
-
-            # Extract cover URL
-            cover_url = None
-            if "cover" in book_data:
-                cover_url = book_data["cover"].get("large") or book_data["cover"].get(
-                    "medium"
-                )
-
-            # Extract description
-            description = None
-            if "excerpts" in book_data and book_data["excerpts"]:
-                description = book_data["excerpts"][0].get("text")
-
-            return BookLookupResult(
-                title=book_data.get("title", "Unknown"),
-                author=author,
-                description=description,
-                cover_url=cover_url,
-                page_count=book_data.get("number_of_pages"),
+            doc = search_data["docs"][0]
+            return BookLookupResult.model_construct(
+                title=doc.get("title", "Unknown"),
+                author=", ".join(doc.get("author_name", ["Unknown"])),
+                description=doc.get("first_sentence", [None])[0]
+                if doc.get("first_sentence")
+                else None,
+                cover_url=COVER_URL(cover_id, "L") if (cover_id := doc.get("cover_i")) else None,
+                page_count=doc.get("number_of_pages_median"),
                 isbn=isbn,
             )
 
+        return self._parse_books_api(isbn, data[key])
+
+    async def fetch_books_batch(self, isbns: list[str]) -> dict[str, BookLookupResult]:
+        """
+        Look up many ISBNs with one books API request per BATCH_SIZE of them.
+
+        Returns the hits keyed by cleaned ISBN and caches them, so later
+        fetch_book_metadata calls for those ISBNs don't go back to the API.
+        ISBNs the books API doesn't know are left out (and not cached), so
+        fetch_book_metadata still tries its fallbacks for them.
+        """
+        results: dict[str, BookLookupResult] = {}
+        uncached = []
+        for isbn in dict.fromkeys(map(clean_isbn, isbns)):
+            cached = self._isbn_cache.get((isbn, True))
+            if cached is MISSING:
+                uncached.append(isbn)
+            elif cached:
+                results[isbn] = cached
+
+        for start in range(0, len(uncached), self.BATCH_SIZE):
+            batch = uncached[start:start + self.BATCH_SIZE]
+            response = await self.get(
+                f"{self.BASE_URL}/api/books",
+                params={
+                    "bibkeys": ",".join(f"ISBN:{isbn}" for isbn in batch),
+                    "format": "json",
+                    "jscmd": "data",
+                },
+            )
+            if response.status_code != 200:
+                continue
+
+            data = orjson.loads(response.content)
+            for isbn in batch:
+                book_data = data.get(f"ISBN:{isbn}")
+                if book_data:
+                    result = self._parse_books_api(isbn, book_data)
+                    results[isbn] = result
+                    for use_fallback in (True, False):
+                        self._isbn_cache.set((isbn, use_fallback), result)
+
+        return results
+
+    @staticmethod
+    def _parse_books_api(isbn: str, book_data: dict) -> BookLookupResult:
+        """Build a lookup result from one books API (jscmd=data) entry."""
+        # Extract authors
+        authors = book_data.get("authors", [])
+        author_names = [a.get("name", "") for a in authors]
+        author = ", ".join(author_names) if author_names else "Unknown"
+
+        # Extract cover URL
+        cover_url = None
+        if "cover" in book_data:
+            cover_url = book_data["cover"].get("large") or book_data["cover"].get(
+                "medium"
+            )
+
+        # Extract description
+        description = None
+        if "excerpts" in book_data and book_data["excerpts"]:
+            description = book_data["excerpts"][0].get("text")
+
+        return BookLookupResult.model_construct(
+            title=book_data.get("title", "Unknown"),
+            author=author,
+            description=description,
+            cover_url=cover_url,
+            page_count=book_data.get("number_of_pages"),
+            isbn=isbn,
+        )
+
     async def search_books(self, query: str, limit: int = 10) -> list[dict]:
         """Search for books by title/author."""
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            url = f"{self.BASE_URL}/search.json?q={query}&limit={limit}"
-            response = await client.get(url)
-
-            if response.status_code != 200:
-                return []
-
-            data = response.json()
-            results = []
-
-            for doc in data.get("docs", []):
-                # Extract first sentence if available
-                first_sentence = None
-                if doc.get("first_sentence"):
-                    sentences = doc["first_sentence"]
-                    first_sentence = sentences[0] if isinstance(sentences, list) else sentences
-
-                result = {
-                    "title": doc.get("title", "Unknown"),
-                    "author": ", ".join(doc.get("author_name", ["Unknown"])),
-                    "isbn": doc.get("isbn", [None])[0] if doc.get("isbn") else None,
-                    "cover_url": f"https://covers.openlibrary.org/b/id/{doc['cover_i']}-M.jpg"
-                    if doc.get("cover_i")
-                    else None,
-                    "first_publish_year": doc.get("first_publish_year"),
-                    "first_sentence": first_sentence,
-                }
-                results.append(result)
-
-            return results
+        url = f"{self.BASE_URL}/search.json"
+        response = await self.get(
+            url, params={"q": query, "limit": limit, "fields": self.SEARCH_FIELDS}
+        )
+
+        if response.status_code != 200:
+            return []
+
+        data = orjson.loads(response.content)
+        results = []
+
+        for doc in data.get("docs", []):
+            # Extract first sentence if available
+            first_sentence = None
+            if doc.get("first_sentence"):
+                sentences = doc["first_sentence"]
+                first_sentence = sentences[0] if isinstance(sentences, list) else sentences
+
+            result = {
+                "title": doc.get("title", "Unknown"),
+                "author": ", ".join(doc.get("author_name", ["Unknown"])),
+                "isbn": doc.get("isbn", [None])[0] if doc.get("isbn") else None,
+                "cover_url": COVER_URL(cover_id, "M") if (cover_id := doc.get("cover_i")) else None,
+                "first_publish_year": doc.get("first_publish_year"),
+                "first_sentence": first_sentence,
+            }
+            results.append(result)
+
+        return results
 
     async def _fallback_to_google_books(self, isbn: str) -> Optional[BookLookupResult]:
-        """Try Google Books API as a fallback."""
+        """
+        Try Google Books API as a fallback.
+
+        Its errors propagate (LookupUnavailable, httpx.HTTPError), so an
+        outage isn't cached as a miss.
+        """
         from .googlebooks import GoogleBooksService
 
-        try:
-            google_service = GoogleBooksService()
-            return await google_service.fetch_book_metadata(isbn)
-        except Exception:
-            return None
+        google_service = GoogleBooksService(client=self.client)
+        return await google_service.fetch_book_metadata(isbn)
+
+
+@lru_cache
+def get_openlibrary_service() -> OpenLibraryService:
+    return OpenLibraryService()
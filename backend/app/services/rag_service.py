@@ -1,20 +1,66 @@
-from typing import Optional
+import asyncio
+import logging
+from functools import lru_cache
+from typing import AsyncIterator, Optional
 
-from groq import Groq
+from groq import AsyncGroq
 
 from ..config import get_settings
-from .vector_store import VectorStore
+from .library_version import library_version
+from .ttl_cache import MISSING, TTLCache
+from .vector_store import get_vector_store
+
+logger = logging.getLogger(__name__)
+
+# Identical on every request, so it is built once (and Groq can reuse its
+# prompt cache for the prefix)
+RAG_SYSTEM_PROMPT = """You are a helpful personal librarian assistant. You help users find books from their personal library based on their queries.
+
+Given the user's query and a list of books from their library, provide a helpful and personalized response. Be conversational but concise.
+
+Guidelines:
+- Recommend books that best match the user's query
+- Explain why each recommendation fits their request
+- If the query is about mood or genre, focus on those aspects
+- Keep responses focused and helpful
+- Reference specific book titles and authors
+- USE YOUR KNOWLEDGE of books to make recommendations. Even if a book's metadata doesn't explicitly list a genre/mood, use what you know about the book to make connections.
+
+Genre Knowledge (use this to identify books even without explicit tags):
+- Cozy mysteries: Often feature amateur sleuths, small-town settings, minimal violence. Examples: books by Richard Osman (Thursday Murder Club), Jesse Q Sutanto, Nita Prose, Alexander McCall Smith
+- Cozy books in general: Heartwarming, low-stakes, often feature food, crafts, or community
+- Thrillers vs mysteries: Thrillers focus on tension/suspense, mysteries focus on puzzle-solving
+
+When matching queries:
+- "cozy mystery" = look for amateur detectives, gentle humor, community settings
+- "thriller" = high stakes, fast pace, danger
+- "literary fiction" = character-driven, prose-focused
+
+If the retrieved books include well-known titles, USE YOUR KNOWLEDGE of those books to assess whether they match the query, even if the stored metadata is incomplete."""
+
+NO_RESULTS_RESPONSE = (
+    "I couldn't find any books matching your query. Try adding some books to your library first!"
+)
 
 
 class RAGService:
     """RAG (Retrieval-Augmented Generation) service using Groq LLM."""
 
     MODEL = "llama-3.3-70b-versatile"
+    # Answers kept in memory per query + filters, LRU-evicted; any library
+    # write changes the key, so the TTL only bounds memory and staleness
+    # from other workers
+    CACHE_SIZE = 1024
+    CACHE_TTL = 10 * 60
+    # Books described to the LLM, however many results are returned; more
+    # only costs prompt tokens without improving the answer
+    MAX_CONTEXT_BOOKS = 10
 
     def __init__(self):
         settings = get_settings()
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
-        self.vector_store = VectorStore()
+        self.client = AsyncGroq(api_key=settings.GROQ_API_KEY)
+        self.vector_store = get_vector_store()
+        self._cache = TTLCache(self.CACHE_SIZE, self.CACHE_TTL)
 
     async def search(
         self,
@@ -29,9 +75,15 @@ class RAGService:
         Perform RAG search: retrieve relevant books and generate response.
 
         Returns both the raw search results and an LLM-generated response.
+        Results are cached until the library changes.
         """
+        cache_key = (query, n_results, category, mood, format, reading_status, library_version())
+        cached = self._cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+
         # Step 1: Retrieve relevant books from vector store
-        search_results = self.vector_store.search(
+        search_results = await self.retrieve(
             query=query,
             n_results=n_results,
             category=category,
@@ -42,7 +94,7 @@ class RAGService:
 
         if not search_results:
             return {
-                "response": "I couldn't find any books matching your query. Try adding some books to your library first!",
+                "response": NO_RESULTS_RESPONSE,
                 "books": [],
             }
 
@@ -50,61 +102,87 @@ class RAGService:
         context = self._build_context(search_results)
 
         # Step 3: Generate response using Groq
-        response = await self._generate_response(query, context, search_results)
+        try:
+            response = "".join([chunk async for chunk in self._generate_response(query, context)])
+        except Exception:
+            logger.warning("RAG response generation failed", exc_info=True)
+            # Not cached, so the next identical query tries Groq again
+            return {
+                "response": self._fallback_response(search_results),
+                "books": search_results,
+            }
 
-        return {
+        result = {
             "response": response,
             "books": search_results,
         }
+        self._cache.set(cache_key, result)
+        return result
 
-    def _build_context(self, books: list[dict]) -> str:
-        """Build context string from book search results."""
-        context_parts = []
-
-        for i, book in enumerate(books, 1):
-            parts = [
-                f"{i}. {book['title']} by {book['author']}",
-                f"   Format: {book['format']}, Status: {book['reading_status']}",
-            ]
-
-            if book.get("categories"):
-                parts.append(f"   Categories: {', '.join(book['categories'])}")
-
-            if book.get("moods"):
-                parts.append(f"   Moods: {', '.join(book['moods'])}")
-
-            context_parts.append("\n".join(parts))
+    async def retrieve(
+        self,
+        query: str,
+        n_results: int = 10,
+        category: Optional[str] = None,
+        mood: Optional[str] = None,
+        format: Optional[str] = None,
+        reading_status: Optional[str] = None,
+    ) -> list[dict]:
+        """Retrieve relevant books from the vector store (embedding + query run off the event loop)."""
+        return await asyncio.to_thread(
+            self.vector_store.search,
+            query=query,
+            n_results=n_results,
+            category=category,
+            mood=mood,
+            format=format,
+            reading_status=reading_status,
+        )
 
-        return "\n\n".join(context_parts)
+    async def stream_response(self, query: str, books: list[dict]) -> AsyncIterator[str]:
+        """
+        Generate the response for retrieved books, yielding text as Groq streams it.
 
-    async def _generate_response(
-        self, query: str, context: str, books: list[dict]
-    ) -> str:
-        """Generate a natural language response using Groq."""
-        system_prompt = """You are a helpful personal librarian assistant. You help users find books from their personal library based on their queries.
+        Falls back to a simple suggestion if Groq fails before sending any text;
+        a failure mid-stream keeps the partial answer.
+        """
+        streamed = False
+        try:
+            async for chunk in self._generate_response(query, self._build_context(books)):
+                streamed = True
+                yield chunk
+        except Exception:
+            logger.warning("RAG response generation failed", exc_info=True)
+            if not streamed:
+                yield self._fallback_response(books)
 
-Given the user's query and a list of books from their library, provide a helpful and personalized response. Be conversational but concise.
+    def _build_context(self, books: list[dict]) -> str:
+        """Build context string from the top MAX_CONTEXT_BOOKS search results."""
+        return "\n\n".join(
+            self._format_book(i, book)
+            for i, book in enumerate(books[:self.MAX_CONTEXT_BOOKS], 1)
+        )
 
-Guidelines:
-- Recommend books that best match the user's query
-- Explain why each recommendation fits their request
-- If the query is about mood or genre, focus on those aspects
-- Keep responses focused and helpful
-- Reference specific book titles and authors
-- USE YOUR KNOWLEDGE of books to make recommendations. Even if a book's metadata doesn't explicitly list a genre/mood, use what you know about the book to make connections.
+    @staticmethod
+    def _format_book(i: int, book: dict) -> str:
+        """One numbered context entry for a book."""
+        part = (
+            f"{i}. {book['title']} by {book['author']}\n"
+            f"   Format: {book['format']}, Status: {book['reading_status']}"
+        )
 
-Genre Knowledge (use this to identify books even without explicit tags):
-- Cozy mysteries: Often feature amateur sleuths, small-town settings, minimal violence. Examples: books by Richard Osman (Thursday Murder Club), Jesse Q Sutanto, Nita Prose, Alexander McCall Smith
-- Cozy books in general: Heartwarming, low-stakes, often feature food, crafts, or community
-- Thrillers vs mysteries: Thrillers focus on tension/suspense, mysteries focus on puzzle-solving
+        categories = book.get("categories")
+        if categories:
+            part += f"\n   Categories: {', '.join(categories)}"
 
-When matching queries:
-- "cozy mystery" = look for amateur detectives, gentle humor, community settings
-- "thriller" = high stakes, fast pace, danger
-- "literary fiction" = character-driven, prose-focused
+        moods = book.get("moods")
+        if moods:
+            part += f"\n   Moods: {', '.join(moods)}"
 
-If the retrieved books include well-known titles, USE YOUR KNOWLEDGE of those books to assess whether they match the query, even if the stored metadata is incomplete."""
+        return part
 
+    async def _generate_response(self, query: str, context: str) -> AsyncIterator[str]:
+        """Generate a natural language response using Groq, streamed in chunks."""
         user_message = f"""Query: {query}
 
 Books in library:
@@ -112,18 +190,28 @@ Books in library:
 
 Based on these books in the user's library, provide a helpful response to their query."""
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message},
-                ],
-                temperature=0.7,
-                max_tokens=500,
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            # Fallback to a simple response if Groq fails
-            book_list = ", ".join([f"'{b['title']}'" for b in books[:3]])
-            return f"Based on your query, you might enjoy: {book_list}. (Note: AI-enhanced responses are currently unavailable.)"
+        stream = await self.client.chat.completions.create(
+            model=self.MODEL,
+            messages=[
+                {"role": "system", "content": RAG_SYSTEM_PROMPT},
+                {"role": "user", "content": user_message},
+            ],
+            temperature=0.7,
+            max_tokens=500,
+            stream=True,
+        )
+        async for chunk in stream:
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            if content:
+                yield content
+
+    @staticmethod
+    def _fallback_response(books: list[dict]) -> str:
+        """Simple response used when Groq fails."""
+        book_list = ", ".join(f"'{b['title']}'" for b in books[:3])
+        return f"Based on your query, you might enjoy: {book_list}. (Note: AI-enhanced responses are currently unavailable.)"
+
+
+@lru_cache
+def get_rag_service() -> RAGService:
+    return RAGService()
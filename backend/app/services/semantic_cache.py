@@ -0,0 +1,57 @@
+"""In-memory cache of search results, looked up by query embedding similarity."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+import numpy as np
+
+from .ttl_cache import MISSING
+
+
+class SemanticCache:
+    """
+    LRU cache whose lookups match on unit-length query embeddings.
+
+    A lookup hits the most similar stored query in the same scope (filters,
+    library version, ...) if its cosine similarity is at least threshold, so
+    rephrasings of a query share one result. Entries expire ttl seconds after
+    they are stored. Thread-safe, since searches run in worker threads.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: OrderedDict[int, tuple[Hashable, float, np.ndarray, Any]] = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def get(self, scope: Hashable, embedding: np.ndarray) -> Any:
+        """Value stored for the closest query in scope, or MISSING."""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                (entry_id, entry[2])
+                for entry_id, entry in self._entries.items()
+                if entry[0] == scope and entry[1] > now
+            ]
+            if not candidates:
+                return MISSING
+
+            similarities = np.stack([e for _, e in candidates]) @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return MISSING
+
+            entry_id = candidates[best][0]
+            self._entries.move_to_end(entry_id)
+            return self._entries[entry_id][3]
+
+    def set(self, scope: Hashable, embedding: np.ndarray, value: Any) -> None:
+        """Store value for a query, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[self._next_id] = (scope, time.monotonic() + self.ttl, embedding, value)
+            self._next_id += 1
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
@@ -0,0 +1,48 @@
+"""In-memory LRU cache with per-entry expiry, for external API lookups."""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# Returned by TTLCache.get for absent or expired keys (None is a cacheable miss)
+MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire ttl seconds after they are stored.
+
+    Expired entries stay until they are evicted or replaced, so get_stale can
+    still serve them as a last known good value when a refresh fails.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value for key, or MISSING."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def get_stale(self, key: Hashable) -> Any:
+        """Cached value for key even if it has expired, or MISSING."""
+        entry = self._entries.get(key)
+        return MISSING if entry is None else entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value, evicting the least recently used entry when full."""
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop key if cached."""
+        self._entries.pop(key, None)
@@ -1,13 +1,26 @@
+import hashlib
 import logging
 import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from typing import Optional
 
+import numpy as np
 from sqlmodel import Session, select, text
-from sqlalchemy import func
+from pgvector import Bit
+from pgvector.sqlalchemy import BIT
+from sqlalchemy import bindparam, cast, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import selectinload
 
+from ..config import get_settings
 from ..database import engine
-from ..models.book import Book, EMBEDDING_DIM
+from ..models.book import Book, BookCategory, BookMood, EmbeddingCache, EMBEDDING_DIM
 from .embedding_service import get_embedding_service
+from .library_version import bump_library_version, library_version
+from .semantic_cache import SemanticCache
+from .ttl_cache import MISSING
 
 logger = logging.getLogger(__name__)
 
@@ -15,27 +28,45 @@ logger = logging.getLogger(__name__)
 class VectorStore:
     """Service for storing and searching book embeddings using pgvector."""
 
-    _instance = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    # Number of texts handed to each worker thread during sync
+    SYNC_CHUNK_SIZE = 128
+    # Number of books loaded, encoded and committed per sync page
+    SYNC_PAGE_SIZE = 500
+    # Rows fetched per round trip when streaming ids
+    ID_FETCH_SIZE = 10_000
+    # Recent search results reused for near-identical queries; any library
+    # write changes their scope, so the TTL only bounds staleness from other
+    # workers
+    SEMANTIC_CACHE_SIZE = 256
+    SEMANTIC_CACHE_TTL = 10 * 60
+    # With BINARY_QUANTIZED_SEARCH, candidates shortlisted by sign bits per
+    # requested result before ranking by the full embedding
+    BINARY_RERANK_FACTOR = 10
 
     def __init__(self):
-        pass
+        # Both are process-wide singletons; resolved once here instead of on
+        # every call
+        self.embedding_service = get_embedding_service()
+        self.settings = get_settings()
+        self._semantic_cache = SemanticCache(
+            self.SEMANTIC_CACHE_SIZE,
+            self.SEMANTIC_CACHE_TTL,
+            self.settings.SEMANTIC_CACHE_THRESHOLD,
+        )
 
     def add_book(
         self, book: Book, categories: list[str] = None, moods: list[str] = None
-    ) -> list[float]:
+    ) -> Optional[np.ndarray]:
         """Generate and store embedding for a book. Returns the embedding."""
-        if os.environ.get("DISABLE_EMBEDDINGS") == "true":
-            return []
+        if self.settings.DISABLE_EMBEDDINGS:
+            return None
 
-        embedding_service = get_embedding_service()
+        # Generate embedding
+        return self.embedding_service.embed_text(self.book_text(book, categories, moods))
 
-        # Create searchable text
-        text_content = embedding_service.create_book_text(
+    def book_text(self, book: Book, categories: list[str] = None, moods: list[str] = None) -> str:
+        """Create the searchable text a book's embedding is generated from."""
+        return self.embedding_service.create_book_text(
             title=book.title,
             author=book.author,
             description=book.description or "",
@@ -43,16 +74,140 @@ class VectorStore:
             moods=moods or [],
         )
 
-        # Generate embedding
-        embedding = embedding_service.embed_text(text_content)
-        return embedding
-
     def update_book(
         self, book: Book, categories: list[str] = None, moods: list[str] = None
-    ) -> list[float]:
+    ) -> Optional[np.ndarray]:
         """Update embedding for a book. Returns the new embedding."""
         return self.add_book(book, categories, moods)
 
+    def embed_book(self, book_id: int) -> None:
+        """
+        Generate and store the embedding for a committed book in its own session.
+
+        Used as a background task so requests don't wait on the model.
+        """
+        if self.settings.DISABLE_EMBEDDINGS:
+            return
+
+        try:
+            with Session(engine) as session:
+                book = session.exec(
+                    select(Book)
+                    .where(Book.id == book_id)
+                    .options(selectinload(Book.categories), selectinload(Book.moods))
+                ).first()
+                if not book:
+                    return
+
+                text_content = self.book_text(
+                    book,
+                    [c.category for c in book.categories],
+                    [m.mood for m in book.moods],
+                )
+                # Edits that don't touch the embedded text (rating, status,
+                # notes, ...) keep the current embedding
+                text_hash = hash_text(text_content)
+                if text_hash == book.embedding_text_hash:
+                    return
+
+                embedding = self._embed_cached(session, [text_content], [text_hash])[0]
+                self._store_embeddings(session, [(book_id, embedding, text_hash)])
+                session.commit()
+                bump_library_version()
+        except Exception:
+            logger.warning(f"Failed to generate embedding for book {book_id}", exc_info=True)
+
+    def embed_books(self, book_ids: list[int]) -> None:
+        """
+        Regenerate and store embeddings for several committed books.
+
+        Background-task counterpart of embed_book for batch edits; books are
+        encoded together in pages of SYNC_PAGE_SIZE.
+        """
+        if self.settings.DISABLE_EMBEDDINGS:
+            return
+
+        try:
+            with Session(engine) as session:
+                for start in range(0, len(book_ids), self.SYNC_PAGE_SIZE):
+                    books = session.exec(
+                        select(
+                            Book.id,
+                            Book.title,
+                            Book.author,
+                            Book.description,
+                            Book.embedding_text_hash,
+                        )
+                        .where(Book.id.in_(book_ids[start:start + self.SYNC_PAGE_SIZE]))
+                        .order_by(Book.id)
+                    ).all()
+                    if books:
+                        self._embed_rows(session, books, skip_unchanged=True)
+        except Exception:
+            logger.warning(f"Failed to generate embeddings for {len(book_ids)} books", exc_info=True)
+
+    def _embed_rows(self, session: Session, books, skip_unchanged: bool = False) -> None:
+        """
+        Encode (id, title, author, description, embedding_text_hash) rows with
+        their tags and bulk-store the embeddings.
+
+        With skip_unchanged, books whose text hashes to the stored
+        embedding_text_hash are left alone.
+        """
+        book_ids = [book.id for book in books]
+        categories = self._load_tags(session, BookCategory.category, book_ids)
+        moods = self._load_tags(session, BookMood.mood, book_ids)
+
+        pending = []
+        for book in books:
+            text_content = self.book_text(book, categories.get(book.id), moods.get(book.id))
+            text_hash = hash_text(text_content)
+            if skip_unchanged and text_hash == book.embedding_text_hash:
+                continue
+            pending.append((book.id, text_content, text_hash))
+        if not pending:
+            return
+
+        embeddings = self._embed_cached(
+            session,
+            [text_content for _, text_content, _ in pending],
+            [text_hash for _, _, text_hash in pending],
+        )
+
+        self._store_embeddings(
+            session,
+            [
+                (book_id, embedding, text_hash)
+                for (book_id, _, text_hash), embedding in zip(pending, embeddings)
+            ],
+        )
+        session.commit()
+        # Search results change once the new embeddings are in
+        bump_library_version()
+
+    @staticmethod
+    def _store_embeddings(session: Session, rows: list[tuple[int, np.ndarray, str]]) -> None:
+        """
+        Bulk UPDATE (book id, embedding, text hash) rows by primary key (executemany).
+
+        updated_at is set to itself so its onupdate stamp doesn't fire: a new
+        embedding isn't an edit, and max(updated_at) keys the duplicates cache.
+        """
+        books = Book.__table__
+        session.exec(
+            update(books)
+            .where(books.c.id == bindparam("book_id"))
+            .values(
+                embedding=bindparam("new_embedding"),
+                embedding_text_hash=bindparam("new_text_hash"),
+                updated_at=books.c.updated_at,
+            ),
+            params=[
+                {"book_id": book_id, "new_embedding": embedding, "new_text_hash": text_hash}
+                for book_id, embedding, text_hash in rows
+            ],
+        )
+
     def delete_book(self, book_id: int):
         """No-op for pgvector - embedding is deleted with the book row."""
         pass
@@ -67,66 +222,171 @@ class VectorStore:
         reading_status: Optional[str] = None,
     ) -> list[dict]:
         """Search for books similar to the query using pgvector."""
-        if os.environ.get("DISABLE_EMBEDDINGS") == "true":
+        if self.settings.DISABLE_EMBEDDINGS:
             return []
 
-        embedding_service = get_embedding_service()
-        query_embedding = embedding_service.embed_text(query)
+        query_embedding = self.embedding_service.embed_query(query)
+
+        # An earlier query that embeds almost the same way, with the same
+        # filters and library contents, has the same answer
+        cache_scope = (n_results, category, mood, format, reading_status, library_version())
+        cached = self._semantic_cache.get(cache_scope, query_embedding)
+        if cached is not MISSING:
+            return cached
+
+        settings = self.settings
+        binary_search = settings.BINARY_QUANTIZED_SEARCH
+        shortlist_size = n_results * self.BINARY_RERANK_FACTOR
 
         with Session(engine) as session:
-            # Build the query with cosine distance
-            # pgvector uses <=> for cosine distance
+            # Tune the HNSW index scan for this transaction only; an HNSW scan
+            # returns at most ef_search rows, so it must cover the shortlist
+            ef_search = max(settings.HNSW_EF_SEARCH, shortlist_size if binary_search else 0)
+            session.exec(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+
+            # Embeddings are unit length, so the inner product is the cosine
+            # similarity; pgvector's <#> returns it negated for ascending order.
+            # Only the columns in the result are selected, with each book's
+            # tags aggregated in the same statement.
             stmt = (
                 select(
-                    Book,
-                    Book.embedding.cosine_distance(query_embedding).label("distance")
+                    Book.id,
+                    Book.title,
+                    Book.author,
+                    Book.format,
+                    Book.reading_status,
+                    self._tag_array(BookCategory.category).label("categories"),
+                    self._tag_array(BookMood.mood).label("moods"),
+                    Book.embedding.max_inner_product(query_embedding).label("distance"),
                 )
                 .where(Book.embedding.isnot(None))
             )
 
-            # Apply filters
+            # Apply filters (tags as EXISTS so the LIMIT counts only matches)
             if format:
                 stmt = stmt.where(Book.format == format)
             if reading_status:
                 stmt = stmt.where(Book.reading_status == reading_status)
+            if category:
+                stmt = stmt.where(
+                    select(BookCategory.id)
+                    .where(BookCategory.book_id == Book.id, BookCategory.category == category)
+                    .exists()
+                )
+            if mood:
+                stmt = stmt.where(
+                    select(BookMood.id)
+                    .where(BookMood.book_id == Book.id, BookMood.mood == mood)
+                    .exists()
+                )
 
-            # Order by distance and limit
-            stmt = stmt.order_by("distance").limit(n_results * 2)  # Get extra for filtering
-
-            results = session.exec(stmt).all()
-
-            # Format results and apply category/mood filters
-            formatted = []
-            for book, distance in results:
-                # Filter by category if specified
-                if category:
-                    book_categories = [c.category for c in book.categories]
-                    if category not in book_categories:
-                        continue
-
-                # Filter by mood if specified
-                if mood:
-                    book_moods = [m.mood for m in book.moods]
-                    if mood not in book_moods:
-                        continue
-
-                formatted.append(
-                    {
-                        "id": book.id,
-                        "title": book.title,
-                        "author": book.author,
-                        "format": book.format,
-                        "reading_status": book.reading_status,
-                        "categories": [c.category for c in book.categories],
-                        "moods": [m.mood for m in book.moods],
-                        "similarity": 1 - distance,  # Convert distance to similarity
-                    }
+            if binary_search:
+                # Shortlist by Hamming distance between sign bits (scanning
+                # the much smaller bit index), then rank it by the embedding
+                bits = cast(func.binary_quantize(Book.embedding), BIT(EMBEDDING_DIM))
+                shortlist = (
+                    stmt.order_by(bits.hamming_distance(Bit(query_embedding > 0)))
+                    .limit(shortlist_size)
+                    .subquery()
                 )
+                stmt = select(shortlist).order_by(shortlist.c.distance).limit(n_results)
+            else:
+                # Order by distance and limit
+                stmt = stmt.order_by("distance").limit(n_results)
+
+            formatted = [
+                {
+                    "id": book_id,
+                    "title": title,
+                    "author": author,
+                    "format": book_format,
+                    "reading_status": status,
+                    "categories": categories,
+                    "moods": moods,
+                    "similarity": -distance,
+                }
+                for book_id, title, author, book_format, status, categories, moods, distance
+                in session.exec(stmt)
+            ]
+
+        self._semantic_cache.set(cache_scope, query_embedding, formatted)
+        return formatted
+
+    @staticmethod
+    def _tag_array(column):
+        """Correlated subquery collecting a book's categories or moods into an array ([] if none)."""
+        model = column.class_
+        return func.coalesce(
+            select(func.array_agg(column))
+            .where(model.book_id == Book.id)
+            .scalar_subquery(),
+            text("'{}'"),
+        )
 
-                if len(formatted) >= n_results:
-                    break
+    @staticmethod
+    def _load_tags(session: Session, column, book_ids: list[int]) -> dict[int, list[str]]:
+        """Load category or mood strings for the given books, keyed by book id."""
+        model = column.class_
+        rows = session.exec(
+            select(model.book_id, column).where(model.book_id.in_(book_ids))
+        ).all()
+
+        tags: dict[int, list[str]] = defaultdict(list)
+        for book_id, tag in rows:
+            tags[book_id].append(tag)
+        return tags
+
+    def _embed_cached(self, session: Session, texts: list[str], text_hashes: list[str]) -> list:
+        """
+        Embeddings for texts (with their hash_text digests), in input order.
+
+        Texts already in embedding_cache for the current model are served
+        from it in one query; only the rest go through the model, and their
+        embeddings are added to the cache in the caller's transaction.
+        """
+        model_key = self.embedding_service.model_key
+        embeddings = dict(session.exec(
+            select(EmbeddingCache.text_hash, EmbeddingCache.embedding).where(
+                EmbeddingCache.model == model_key,
+                EmbeddingCache.text_hash.in_(set(text_hashes)),
+            )
+        ).all())
+
+        # Books with identical text share one encode
+        missing = {
+            text_hash: text_content
+            for text_content, text_hash in zip(texts, text_hashes)
+            if text_hash not in embeddings
+        }
+        if missing:
+            computed = dict(zip(missing, self._embed_parallel(list(missing.values()))))
+            embeddings.update(computed)
+            # Another worker may have cached the same text meanwhile; keep theirs
+            insert = postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+            session.exec(
+                insert(EmbeddingCache).on_conflict_do_nothing(),
+                params=[
+                    {"text_hash": text_hash, "model": model_key, "embedding": embedding}
+                    for text_hash, embedding in computed.items()
+                ],
+            )
+
+        return [embeddings[text_hash] for text_hash in text_hashes]
+
+    def _embed_parallel(self, texts: list[str]) -> np.ndarray:
+        """Encode texts in chunks across a thread pool, preserving input order."""
+        encode = partial(self.embedding_service.embed_texts, batch_size=self.embedding_service.batch_size)
 
-            return formatted
+        chunks = [
+            texts[i:i + self.SYNC_CHUNK_SIZE]
+            for i in range(0, len(texts), self.SYNC_CHUNK_SIZE)
+        ]
+        if len(chunks) == 1:
+            return encode(chunks[0])
+
+        max_workers = min(len(chunks), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return np.vstack(list(executor.map(encode, chunks)))
 
     def count(self) -> int:
         """Get the number of books with embeddings."""
@@ -136,47 +396,83 @@ class VectorStore:
             ).one()
             return result
 
-    def get_all_book_ids(self) -> list[int]:
-        """Get all book IDs that have embeddings."""
+    def get_all_book_ids(self) -> np.ndarray:
+        """Get all book IDs that have embeddings, as an int64 array."""
         with Session(engine) as session:
+            # Stream the ids straight into the array instead of building a
+            # list of Python ints first
             results = session.exec(
-                select(Book.id).where(Book.embedding.isnot(None))
-            ).all()
-            return list(results)
+                select(Book.id)
+                .where(Book.embedding.isnot(None))
+                .execution_options(yield_per=self.ID_FETCH_SIZE)
+            )
+            return np.fromiter(results, dtype=np.int64)
 
-    def sync_from_database(self, session: Session) -> int:
+    def sync_from_database(self, session: Session, book_ids: Optional[list[int]] = None) -> int:
         """
         Generate embeddings for all books that don't have them.
-        Returns the number of books updated.
+
+        If book_ids is given (the ids already known to be missing an
+        embedding), only those rows are loaded; otherwise the table is
+        walked by id. Books are processed in pages of SYNC_PAGE_SIZE so
+        memory stays flat regardless of library size. Each page is encoded
+        in batched model calls, sharded across a thread pool (torch releases
+        the GIL while encoding), written back with one bulk UPDATE and
+        committed. Returns the number of books updated.
         """
-        if os.environ.get("DISABLE_EMBEDDINGS") == "true":
+        if self.settings.DISABLE_EMBEDDINGS:
             logger.info("Embeddings disabled, skipping sync")
             return 0
 
-        # Get books without embeddings
-        books = session.exec(
-            select(Book).where(Book.embedding.is_(None))
-        ).unique().all()
+        added_count = 0
+        last_id = 0
+        offset = 0
 
-        if not books:
-            return 0
+        while True:
+            # Page over books missing embeddings; only the columns needed to
+            # build the text, never the embedding itself
+            query = (
+                select(
+                    Book.id,
+                    Book.title,
+                    Book.author,
+                    Book.description,
+                    Book.embedding_text_hash,
+                )
+                .where(Book.embedding.is_(None))
+                .order_by(Book.id)
+            )
+            if book_ids is None:
+                query = query.where(Book.id > last_id).limit(self.SYNC_PAGE_SIZE)
+            else:
+                page_ids = book_ids[offset:offset + self.SYNC_PAGE_SIZE]
+                if not page_ids:
+                    break
+                offset += len(page_ids)
+                query = query.where(Book.id.in_(page_ids))
 
-        added_count = 0
-        for book in books:
-            try:
-                categories = [c.category for c in book.categories]
-                moods = [m.mood for m in book.moods]
-                embedding = self.add_book(book, categories, moods)
-                book.embedding = embedding
-                added_count += 1
+            books = session.exec(query).all()
 
-                # Commit in batches of 50
-                if added_count % 50 == 0:
-                    session.commit()
-                    logger.info(f"Synced {added_count} books...")
+            if not books:
+                if book_ids is None:
+                    break
+                # Every id in this slice was embedded in the meantime
+                continue
 
-            except Exception as e:
-                logger.warning(f"Failed to generate embedding for book {book.id}: {e}")
+            self._embed_rows(session, books)
+
+            added_count += len(books)
+            last_id = books[-1].id
+            logger.info(f"Synced {added_count} books...")
 
-        session.commit()
         return added_count
+
+
+def hash_text(text_content: str) -> str:
+    """Digest of a book's embedded text, stored to detect when it changes."""
+    return hashlib.blake2b(text_content.encode(), digest_size=16).hexdigest()
+
+
+@lru_cache
+def get_vector_store() -> VectorStore:
+    return VectorStore()
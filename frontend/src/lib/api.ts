@@ -13,10 +13,10 @@ import type {
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api';
 
-async function fetchApi<T>(
+async function fetchResponse(
   endpoint: string,
   options?: RequestInit
-): Promise<T> {
+): Promise<Response> {
   const response = await fetch(`${API_URL}${endpoint}`, {
     ...options,
     headers: {
@@ -42,6 +42,14 @@ async function fetchApi<T>(
     throw new Error(message);
   }
 
+  return response;
+}
+
+async function fetchApi<T>(
+  endpoint: string,
+  options?: RequestInit
+): Promise<T> {
+  const response = await fetchResponse(endpoint, options);
   return response.json();
 }
 
@@ -51,6 +59,8 @@ export async function getConfig(): Promise<Config> {
 }
 
 // Books
+const BOOKS_PAGE_SIZE = 200;
+
 export async function getBooks(filters?: BookFilters): Promise<Book[]> {
   const params = new URLSearchParams();
   if (filters?.category) params.set('category', filters.category);
@@ -58,9 +68,19 @@ export async function getBooks(filters?: BookFilters): Promise<Book[]> {
   if (filters?.format) params.set('format', filters.format);
   if (filters?.reading_status) params.set('reading_status', filters.reading_status);
   if (filters?.search) params.set('search', filters.search);
-
-  const query = params.toString();
-  return fetchApi<Book[]>(`/books${query ? `?${query}` : ''}`);
+  params.set('limit', String(BOOKS_PAGE_SIZE));
+
+  // The API returns one page at a time; follow X-Next-Cursor to the end
+  const books: Book[] = [];
+  let cursor: string | null = null;
+  do {
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetchResponse(`/books?${params.toString()}`);
+    books.push(...((await response.json()) as Book[]));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+
+  return books;
 }
 
 export async function getBook(id: number): Promise<Book> {